@@ -3,24 +3,71 @@ import aiohttp
 import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from pathlib import Path
 
 from app.knowledge_manager import KnowledgeManager
 from app.web_research import WebResearcher
 from app.code_generator import CodeGenerator
 from app.self_improvement import SelfImprover
+from app.generation_cache import GenerationCache
+from app.single_flight import SingleFlight
+from app.job_queue import JobQueue, JobProgress
 
 logger = logging.getLogger(__name__)
 
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+# مفاتيح دمج الطلبات المتطابقة لكل نقطة نهاية
+def _generate_key(task: str, language: str = "python", context: Optional[str] = None):
+    return (_normalize(task), language, context or "")
+
+def _learn_key(topic: str, sources: Optional[List[str]] = None, depth: str = "intermediate"):
+    return (_normalize(topic), tuple(sources or ()), depth)
+
+def _merge_learned(learned: Dict[str, Any], processed: Dict[str, Any]):
+    """دمج معرفة مصدر في معرفة الموضوع: القوائم تُضم والأجزاء المتخطاة تُجمع"""
+    for key, value in processed.items():
+        if isinstance(value, list):
+            items = learned.setdefault(key, [])
+            items.extend(item for item in value if key == "chunks" or item not in items)
+        elif key == "skipped_chunks":
+            learned[key] = learned.get(key, 0) + value
+        else:
+            learned[key] = value
+
+def _research_key(query: str, max_results: int = 5, focus_on: Optional[List[str]] = None,
+                  include_content: bool = True):
+    return (_normalize(query), max_results, tuple(focus_on or ()), include_content)
+
 class AICore:
     def __init__(self):
         self.knowledge_manager = KnowledgeManager()
         self.web_researcher = WebResearcher()
         self.code_generator = CodeGenerator(self.knowledge_manager)
         self.self_improver = SelfImprover(self.knowledge_manager)
+        self.generation_cache = GenerationCache(
+            self.knowledge_manager.knowledge_path / "generation_cache",
+            embed=self.knowledge_manager.embed_text
+        )
+        max_waiters = int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "64"))
+        self.flights = {
+            "generate": SingleFlight(_generate_key, max_waiters),
+            "learn": SingleFlight(_learn_key, max_waiters),
+            "research": SingleFlight(_research_key, max_waiters)
+        }
+        self.learning_jobs = JobQueue(
+            self.knowledge_manager.knowledge_path / "jobs",
+            workers=int(os.getenv("LEARN_JOB_WORKERS", "2")),
+            max_pending=int(os.getenv("LEARN_JOB_MAX_PENDING", "100")),
+            progress_interval=float(os.getenv("LEARN_JOB_PROGRESS_INTERVAL", "5")),
+            retention_days=float(os.getenv("LEARN_JOB_RETENTION_DAYS", "7")),
+            max_kept=int(os.getenv("LEARN_JOB_MAX_KEPT", "1000"))
+        )
         self.initialized = False
         self._init_done = False
+        self._base_knowledge_task: Optional[asyncio.Task] = None
         
     async def initialize(self):
         """تهيئة النواة الأساسية"""
@@ -28,8 +75,13 @@ class AICore:
             return
             
         try:
-            # تحميل المعرفة الأساسية
-            await self.knowledge_manager.load_base_knowledge()
+            # تحميل نموذج التضمين وقاعدة المتجهات في الخلفية
+            warmup = os.getenv("MODEL_WARMUP", "true").lower() != "false"
+            if warmup:
+                self.knowledge_manager.start_warmup()
+            
+            # تحميل المعرفة الأساسية في الخلفية؛ قد تحتاج إلى انتظار نموذج التضمين
+            self._base_knowledge_task = asyncio.create_task(self._load_base_knowledge(lazy=not warmup))
             
             # تهيئة باحث الويب
             await self.web_researcher.initialize()
@@ -37,6 +89,9 @@ class AICore:
             # تحميل نماذج توليد الأكواد
             await self.code_generator.initialize()
             
+            # تشغيل عمال مهام التعلم في الخلفية
+            await self.learning_jobs.start(self._run_learning_job)
+            
             self.initialized = True
             self._init_done = True
             logger.info("AI Core initialized successfully")
@@ -49,24 +104,96 @@ class AICore:
         if not self.initialized:
             await self.initialize()
             
-        # البحث عن معرفة ذات صلة
+        # الطلبات المتطابقة المتزامنة تتشارك تنفيذاً واحداً
+        return await self.flights["generate"].do(self._generate_code, task, language, context)
+
+    async def _generate_code(self, task: str, language: str = "python", context: Optional[str] = None) -> str:
+        """تنفيذ التوليد فعلياً (مرة واحدة لكل مجموعة طلبات متطابقة)"""
+        # المهام المتكررة تُخدم من الذاكرة المؤقتة دون بحث أو استدعاء للنموذج
+        cached = await self.generation_cache.get(task, language, context)
+        if cached is not None:
+            return cached
+            
+        # البحث عن معرفة ذات صلة (فارغ قبل اكتمال تحميل النموذج)
+        knowledge_ready = self.knowledge_manager.status()["ready"]
         relevant_knowledge = await self.knowledge_manager.find_relevant_knowledge(task, language)
         
         # توليد الكود
-        code = await self.code_generator.generate(
+        code, from_model = await self.code_generator.generate_detailed(
             task=task, 
             language=language, 
             context=context,
             knowledge=relevant_knowledge
         )
         
+        # لا نخزن الكود البديل الثابت ولا كوداً وُلد دون معرفة حتى لا يحجب نتائج أفضل لاحقاً
+        if from_model and knowledge_ready:
+            await self.generation_cache.set(task, language, context, code)
+        
         return code
 
+    async def generate_code_stream(self, task: str, language: str = "python",
+                                   context: Optional[str] = None) -> AsyncIterator[str]:
+        """توليد كود بوضع التدفق"""
+        if not self.initialized:
+            await self.initialize()
+            
+        cached = await self.generation_cache.get(task, language, context)
+        if cached is not None:
+            yield cached
+            return
+            
+        knowledge_ready = self.knowledge_manager.status()["ready"]
+        relevant_knowledge = await self.knowledge_manager.find_relevant_knowledge(task, language)
+        
+        outcome = {"from_model": False}
+        pieces = []
+        async for piece in self.code_generator.generate_stream(
+            task=task,
+            language=language,
+            context=context,
+            knowledge=relevant_knowledge,
+            outcome=outcome
+        ):
+            pieces.append(piece)
+            yield piece
+        
+        # نفس شروط التخزين في _generate_code؛ الرد المقطوع أو البديل لا يُخزن
+        if outcome["from_model"] and knowledge_ready:
+            await self.generation_cache.set(task, language, context, "".join(pieces))
+
+    async def research(self, query: str, max_results: int = 5, focus_on: Optional[List[str]] = None,
+                       include_content: bool = True) -> Dict:
+        """البحث على الإنترنت واستخراج محتوى النتائج"""
+        if not self.initialized:
+            await self.initialize()
+            
+        return await self.flights["research"].do(self._research, query, max_results, focus_on, include_content)
+
+    async def _research(self, query: str, max_results: int = 5, focus_on: Optional[List[str]] = None,
+                        include_content: bool = True) -> Dict:
+        """تنفيذ البحث فعلياً (مرة واحدة لكل مجموعة طلبات متطابقة)"""
+        async for event in self.web_researcher.research_events(query, max_results, focus_on, include_content):
+            if event["type"] == "summary":
+                event.pop("type")
+                return event
+        
+    async def _load_base_knowledge(self, lazy: bool):
+        """تحميل المعرفة الأساسية؛ مع تعطيل التسخين ننتظر أول استخدام يحمّل النموذج بدلاً من تحميله هنا"""
+        if lazy:
+            await self.knowledge_manager.wait_ready()
+        await self.knowledge_manager.load_base_knowledge()
+
     async def learn_topic(self, topic: str, sources: Optional[List[str]] = None, depth: str = "intermediate") -> Dict:
         """تعلم موضوع جديد"""
         if not self.initialized:
             await self.initialize()
             
+        return await self.flights["learn"].do(self._learn_topic, topic, sources, depth)
+
+    async def _learn_topic(self, topic: str, sources: Optional[List[str]] = None, depth: str = "intermediate",
+                           progress: Optional[JobProgress] = None) -> Dict:
+        """تنفيذ التعلم فعلياً (مرة واحدة لكل مجموعة طلبات متطابقة)"""
         learned_data = {}
         
         # إذا لم يتم توفير مصادر، البحث على الإنترنت
@@ -74,14 +201,26 @@ class AICore:
             search_results = await self.web_researcher.search(f"{topic} programming {depth}")
             sources = [result["url"] for result in search_results[:3]]
         
-        # جمع المعلومات من المصادر
-        for source in sources:
+        if progress:
+            for source in sources:
+                progress.source(source, "pending")
+        
+        # جمع المعلومات من المصادر بالتوازي
+        async for source, content in self.web_researcher.extract_many(sources):
             try:
-                content = await self.web_researcher.extract_content(source)
-                processed = await self.knowledge_manager.process_content(topic, content, source)
-                learned_data.update(processed)
+                if progress:
+                    progress.source(source, "fetched")
+                processed = await self.knowledge_manager.process_content(
+                    topic, content, source,
+                    progress=(lambda done, total, url=source: progress.chunks(url, done, total)) if progress else None
+                )
+                _merge_learned(learned_data, processed)
+                if progress:
+                    progress.source(source, "processed")
             except Exception as e:
                 logger.error(f"Failed to learn from {source}: {e}")
+                if progress:
+                    progress.source(source, "failed")
                 continue
         
         # حفظ المعرفة المكتسبة
@@ -89,6 +228,36 @@ class AICore:
         
         return learned_data
 
+    async def submit_learning_job(self, topic: str, sources: Optional[List[str]] = None,
+                                  depth: str = "intermediate", priority: int = 0) -> Dict:
+        """إضافة مهمة تعلم إلى طابور الخلفية وإرجاع سجلها فوراً"""
+        if not self.initialized:
+            await self.initialize()
+            
+        return await self.learning_jobs.submit(
+            {"topic": topic, "sources": sources, "depth": depth},
+            priority=priority
+        )
+
+    async def get_learning_job(self, job_id: str) -> Optional[Dict]:
+        """حالة مهمة تعلم وتقدمها"""
+        return await self.learning_jobs.get(job_id)
+
+    async def _run_learning_job(self, job: Dict, progress: JobProgress) -> Dict:
+        """تنفيذ مهمة تعلم داخل عامل الطابور"""
+        payload = job["payload"]
+        learned_data = await self._learn_topic(
+            payload["topic"], payload.get("sources"), payload.get("depth", "intermediate"), progress
+        )
+        # نحفظ ملخصاً فقط؛ المعرفة الكاملة محفوظة مسبقاً عبر save_knowledge
+        return {
+            "key_concepts": learned_data.get("key_points", []),
+            "related_topics": learned_data.get("related_topics", []),
+            "sources_used": list(progress.job["progress"]["sources"]),
+            "chunks_learned": len(learned_data.get("chunks", [])),
+            "skipped_chunks": learned_data.get("skipped_chunks", 0)
+        }
+
     async def improve_code(self, code: str, language: str, suggestions: Optional[List[str]] = None) -> str:
         """تحسين كود موجود"""
         if not self.initialized:
@@ -118,5 +287,11 @@ class AICore:
 
     async def close(self):
         """إغلاق الموارد"""
+        if self._base_knowledge_task:
+            self._base_knowledge_task.cancel()
+            await asyncio.gather(self._base_knowledge_task, return_exceptions=True)
+        await self.learning_jobs.close()
         await self.web_researcher.close()
+        await self.knowledge_manager.close()
+        await self.code_generator.close()
         logger.info("AI Core resources released")
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import re
+import logging
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# نهاية الجملة: علامة ترقيم (بما فيها العربية) متبوعة بمسافة
+SENTENCE_END = re.compile(r"(?<=[.!?؟。])\s+")
+FENCE = re.compile(r"^\s*(```|~~~)")
+WORD = re.compile(r"\S+")
+
+def word_count(text: str) -> int:
+    """تقدير عدد الرموز عند عدم توفر محلل النموذج"""
+    return len(text.split())
+
+class Chunker:
+    """تقسيم النص تدريجياً إلى أجزاء تحترم حدود الفقرات والجمل وكتل الكود، مع تداخل بين الأجزاء"""
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None,
+                 max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None):
+        self.count_tokens = count_tokens or word_count
+        self.max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else int(
+            os.getenv("CHUNK_OVERLAP_TOKENS", "32")
+        )
+        if self.overlap_tokens >= self.max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    def _blocks(self, text: str) -> Iterator[Tuple[str, bool]]:
+        """إرجاع الفقرات وكتل الكود المسيّجة بالترتيب: (النص، هل هو كود)"""
+        lines: List[str] = []
+        in_code = False
+
+        # finditer يمر على الأسطر دون إنشاء قائمة بكل أسطر المستند
+        for match in re.finditer(r"[^\n]*\n?", text):
+            line = match.group().rstrip("\n")
+            if not match.group():
+                break
+
+            if FENCE.match(line):
+                if in_code:
+                    lines.append(line)
+                    yield "\n".join(lines), True
+                    lines = []
+                    in_code = False
+                else:
+                    if lines:
+                        yield "\n".join(lines), False
+                    lines = [line]
+                    in_code = True
+            elif in_code:
+                lines.append(line)
+            elif not line.strip():
+                if lines:
+                    yield "\n".join(lines), False
+                    lines = []
+            else:
+                lines.append(line.strip())
+
+        if lines:
+            yield "\n".join(lines), in_code
+
+    def _count(self, text: str) -> int:
+        """عدد رموز النص، أو max_tokens + 1 دون عد إذا كان عدد كلماته وحده يتجاوز الحد"""
+        # كل كلمة رمز واحد على الأقل، فالنص الطويل (صفحة ويب في سطر واحد) لا يُمرر كاملاً للمحلل
+        words = 0
+        for _ in WORD.finditer(text):
+            words += 1
+            if words > self.max_tokens:
+                return self.max_tokens + 1
+        return self.count_tokens(text)
+
+    @staticmethod
+    def _sentences(text: str) -> Iterator[str]:
+        """الجمل واحدة تلو الأخرى دون إنشاء قائمة بها"""
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            yield text[start:match.start()].replace("\n", " ")
+            start = match.end()
+        yield text[start:].replace("\n", " ")
+
+    def _units(self, text: str) -> Iterator[Tuple[str, int, str]]:
+        """أصغر وحدات التقسيم: (النص، عدد الرموز، الفاصل قبلها)"""
+        for block, is_code in self._blocks(text):
+            block_tokens = self._count(block)
+            if block_tokens <= self.max_tokens:
+                yield block, block_tokens, "\n\n"
+                continue
+
+            # الكتل الكبيرة تُقسم على الأسطر للكود وعلى الجمل للنص
+            pieces = block.split("\n") if is_code else self._sentences(block)
+            separator = "\n\n"
+            for piece in pieces:
+                if not piece.strip() and not is_code:
+                    continue
+                tokens = self._count(piece)
+                if tokens <= self.max_tokens:
+                    yield piece, tokens, separator
+                else:
+                    yield from self._split_words(piece, separator)
+                separator = "\n" if is_code else " "
+
+    def _split_words(self, text: str, separator: str) -> Iterator[Tuple[str, int, str]]:
+        """الملاذ الأخير لجملة أو سطر أطول من الحد: التقسيم على الكلمات"""
+        words: List[str] = []
+        tokens = 0
+        for match in WORD.finditer(text):
+            word = match.group()
+            # عد رموز كل كلمة على حدة يتجنب إعادة عد النص المتراكم
+            word_tokens = self.count_tokens(word)
+            if words and tokens + word_tokens > self.max_tokens:
+                yield " ".join(words), tokens, separator
+                separator = " "
+                words, tokens = [], 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            yield " ".join(words), tokens, separator
+
+    def chunks(self, text: str) -> Iterator[str]:
+        """إرجاع الأجزاء واحداً تلو الآخر"""
+        current: List[Tuple[str, int, str]] = []
+        current_tokens = 0
+        fresh = 0
+
+        for unit in self._units(text):
+            if current and current_tokens + unit[1] > self.max_tokens:
+                if fresh:
+                    yield self._join(current)
+                current, current_tokens = self._overlap(current)
+                fresh = 0
+                # التداخل لا يجب أن يمنع الوحدة الجديدة من الدخول
+                while current and current_tokens + unit[1] > self.max_tokens:
+                    current_tokens -= current.pop(0)[1]
+
+            current.append(unit)
+            current_tokens += unit[1]
+            fresh += 1
+
+        if current and fresh:
+            yield self._join(current)
+
+    def _overlap(self, units: List[Tuple[str, int, str]]) -> Tuple[List[Tuple[str, int, str]], int]:
+        """آخر الوحدات التي تتسع ضمن ميزانية التداخل لتبدأ بها القطعة التالية"""
+        kept: List[Tuple[str, int, str]] = []
+        tokens = 0
+        for unit in reversed(units):
+            if tokens + unit[1] > self.overlap_tokens:
+                break
+            kept.insert(0, unit)
+            tokens += unit[1]
+        return kept, tokens
+
+    @staticmethod
+    def _join(units: List[Tuple[str, int, str]]) -> str:
+        text = units[0][0]
+        for unit_text, _, separator in units[1:]:
+            text += separator + unit_text
+        return text
+
+    def estimate_count(self, text: str) -> int:
+        """تقدير تقريبي لعدد الأجزاء لعرض التقدم قبل انتهاء التقسيم"""
+        step = max(1, self.max_tokens - self.overlap_tokens)
+        return max(1, -(-word_count(text) // step))
@@ -1,20 +1,72 @@
 import os
 import logging
-from typing import Dict, List, Any, Optional
-import openai
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
+from app.llm_client import AsyncLLMClient
+from app.prompt_builder import PromptBuilder
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+class FenceStripper:
+    """إزالة أسوار markdown من الكود المتدفق تدريجياً دون انتظار النص كاملاً"""
+
+    def __init__(self):
+        self._head = ""
+        self._pending = ""
+        self._in_body = False
+        self._fenced = False
+
+    def feed(self, text: str) -> str:
+        """إضافة جزء جديد وإرجاع ما يمكن إرساله منه بأمان"""
+        if not self._in_body:
+            self._head += text
+            stripped = self._head.lstrip()
+            if not stripped:
+                return ""
+            if stripped.startswith("```"):
+                # ننتظر نهاية سطر الافتتاح ثم نتخطاه
+                if "\n" not in stripped:
+                    return ""
+                self._fenced = True
+                text = stripped.split("\n", 1)[1]
+            elif "```".startswith(stripped):
+                return ""
+            else:
+                text = stripped
+            self._in_body = True
+
+        # نحتجز آخر سطر غير فارغ (وما يليه) لاحتمال أن يكون سور الإغلاق
+        self._pending += text
+        cut = self._pending.rstrip().rfind("\n")
+        if cut <= 0:
+            return ""
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return ready
+
+    def finish(self) -> str:
+        """إرجاع ما تبقى بعد انتهاء التدفق"""
+        if not self._in_body:
+            return self._head.strip()
+
+        tail = self._pending.rstrip()
+        last_line = tail.rsplit("\n", 1)[-1]
+        if self._fenced and last_line.startswith("```"):
+            tail = tail[:len(tail) - len(last_line)].rstrip("\n")
+        return tail
+
 class CodeGenerator:
     def __init__(self, knowledge_manager):
         self.knowledge_manager = knowledge_manager
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4")
+        self.llm_client = None
+        self.prompt_builder = PromptBuilder(self.model)
         
         if self.openai_api_key:
-            openai.api_key = self.openai_api_key
+            self.llm_client = AsyncLLMClient(self.openai_api_key)
         else:
             logger.warning("OPENAI_API_KEY not found, using fallback code generation")
     
@@ -25,63 +77,88 @@ class CodeGenerator:
     async def generate(self, task: str, language: str = "python", 
                       context: Optional[str] = None, knowledge: List[Dict] = None) -> str:
         """توليد كود بناء على المهمة والمعرفة"""
-        try:
-            if self.openai_api_key:
-                return await self._generate_with_ai(task, language, context, knowledge)
-            else:
-                return await self._generate_fallback(task, language, context)
-        except Exception as e:
-            logger.error(f"Code generation failed: {e}")
-            return await self._generate_fallback(task, language, context)
+        code, _ = await self.generate_detailed(task, language, context, knowledge)
+        return code
+    
+    async def generate_detailed(self, task: str, language: str = "python",
+                                context: Optional[str] = None, knowledge: List[Dict] = None) -> Tuple[str, bool]:
+        """توليد كود مع الإشارة إلى ما إذا كان الناتج من النموذج أم من البديل الثابت"""
+        if self.llm_client:
+            try:
+                return await self._generate_with_ai(task, language, context, knowledge), True
+            except Exception as e:
+                logger.error(f"Code generation failed: {e}")
+        return await self._generate_fallback(task, language, context), False
     
     async def _generate_with_ai(self, task: str, language: str, 
                                context: Optional[str], knowledge: List[Dict]) -> str:
         """توليد الكود باستخدام الذكاء الاصطناعي"""
         # بناء الرسالة (prompt)
-        messages = self._build_messages(task, language, context, knowledge)
+        messages, max_tokens = self._build_messages(task, language, context, knowledge)
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            code = response.choices[0].message.content.strip()
-            return self._clean_code(code, language)
-            
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return await self._generate_fallback(task, language, context)
+        response = await self.llm_client.chat(
+            messages=messages,
+            model=self.model,
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        
+        code = response.strip()
+        return self._clean_code(code, language)
+    
+    async def generate_stream(self, task: str, language: str = "python",
+                              context: Optional[str] = None, knowledge: List[Dict] = None,
+                              outcome: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """توليد كود بوضع التدفق وإرجاع أجزائه فور وصولها (outcome["from_model"] يصبح True إذا اكتمل رد النموذج)"""
+        if self.llm_client:
+            messages, max_tokens = self._build_messages(task, language, context, knowledge)
+            stripper = FenceStripper()
+            started = False
+            try:
+                async for token in self.llm_client.stream_chat(
+                    messages=messages,
+                    model=self.model,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                ):
+                    piece = stripper.feed(token)
+                    if piece:
+                        started = True
+                        yield piece
+                tail = stripper.finish()
+                if tail:
+                    yield tail
+                if outcome is not None:
+                    outcome["from_model"] = True
+                return
+            except Exception as e:
+                logger.error(f"OpenAI streaming error: {e}")
+                # لا يمكن استبدال ما أُرسل بالفعل إلى العميل
+                if started:
+                    return
+        
+        code = await self._generate_fallback(task, language, context)
+        for line in code.splitlines(keepends=True):
+            yield line
     
     def _build_messages(self, task: str, language: str, 
-                       context: Optional[str], knowledge: List[Dict]) -> List[Dict]:
-        """بناء رسائل المحادثة للذكاء الاصطناعي"""
-        system_message = {
-            "role": "system",
-            "content": f"""أنت مساعد ذكاء اصطناعي خبير في البرمجة. مهمتك هي كتابة كود {language} عالي الجودة.
+                       context: Optional[str], knowledge: List[Dict]) -> Tuple[List[Dict], int]:
+        """بناء رسائل المحادثة للذكاء الاصطناعي ضمن ميزانية الرموز، مع الحد الأقصى لرموز الرد"""
+        system_content = f"""أنت مساعد ذكاء اصطناعي خبير في البرمجة. مهمتك هي كتابة كود {language} عالي الجودة.
 يجب أن يكون الكود:
 - صحيحًا ومنطقيًا
 - متبعًا لأفضل الممارسات
 - واضحًا وسهل القراءة
 - شاملًا للتعليقات التوضيحية عند الحاجة
 - متضمنًا لمعالجة الأخطاء عندما يكون ذلك مناسبًا"""
-        }
         
         user_content = f"المهمة: {task}\n\n"
         
         if context:
             user_content += f"السياق: {context}\n\n"
             
-        if knowledge:
-            user_content += "المعرفة ذات الصلة:\n"
-            for i, item in enumerate(knowledge, 1):
-                user_content += f"{i}. {item.get('content', '')[:200]}...\n"
-        
-        user_message = {"role": "user", "content": user_content}
-        
-        return [system_message, user_message]
+        # المعرفة تُرتب حسب التشابه وتُحزم ضمن الميزانية المتاحة
+        return self.prompt_builder.build(system_content, user_content, knowledge)
     
     async def _generate_fallback(self, task: str, language: str, context: Optional[str]) -> str:
         """توليد كود بديل عند عدم توفر API"""
@@ -113,4 +190,9 @@ if __name__ == "__main__":
                 lines = lines[:-1]
             code = '\n'.join(lines)
         
-        return code
\ No newline at end of file
+        return code
+    
+    async def close(self):
+        """إغلاق الموارد"""
+        if self.llm_client:
+            await self.llm_client.close()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+from pathlib import Path
+
+from app.persistence import dumps, atomic_write, read_json
+
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """ذاكرة مؤقتة على القرص مع صلاحية زمنية وحذف LRU ضمن ميزانية للحجم"""
+
+    def __init__(self, directory: Path, max_bytes: int = 200 * 1024 * 1024, default_ttl: float = 86400):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # فهرس في الذاكرة: اسم الملف -> [الحجم، آخر وصول]
+        self._index: Optional[Dict[str, list]] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _filename(self, key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest() + ".json"
+
+    def _ensure_index(self):
+        """بناء الفهرس من محتوى المجلد عند أول استخدام"""
+        if self._index is not None:
+            return
+
+        self._index = {}
+        self._total_bytes = 0
+        if not self.directory.exists():
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                self._index[entry.name] = [stat.st_size, stat.st_mtime]
+                self._total_bytes += stat.st_size
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """هل ما زال العنصر ضمن مدة صلاحيته"""
+        return time.time() - entry["stored_at"] < entry["ttl"]
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        name = self._filename(key)
+        path = self.directory / name
+        with self._lock:
+            self._ensure_index()
+            if name not in self._index:
+                return None
+            try:
+                entry = read_json(path)
+                # تحديث وقت الوصول لحذف LRU
+                now = time.time()
+                os.utime(path, (now, now))
+                self._index[name][1] = now
+                return entry
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {name}: {e}")
+                self._remove(name)
+                return None
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        name = self._filename(key)
+        path = self.directory / name
+        data = dumps(entry)
+        with self._lock:
+            self._ensure_index()
+            # لا حاجة إلى fsync: فقدان عنصر من الذاكرة المؤقتة بعد انقطاع الطاقة لا يضر
+            atomic_write(path, data, fsync=False)
+
+            old_size = self._index.get(name, [0])[0]
+            self._index[name] = [len(data), time.time()]
+            self._total_bytes += len(data) - old_size
+            self._evict()
+
+    def _remove(self, name: str):
+        size = self._index.pop(name, [0])[0]
+        self._total_bytes -= size
+        try:
+            (self.directory / name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """حذف العناصر الأقل استخداماً حتى يعود الحجم ضمن الميزانية"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for name, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(name)
+
+    async def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """إرجاع العنصر المخزن حتى لو انتهت صلاحيته (لإعادة التحقق)"""
+        return await asyncio.to_thread(self._read, key)
+
+    async def get(self, key: str) -> Any:
+        """إرجاع القيمة إذا كانت صالحة فقط"""
+        entry = await self.get_entry(key)
+        if entry and self.is_fresh(entry):
+            return entry["value"]
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, meta: Optional[Dict[str, Any]] = None):
+        """تخزين قيمة مع بيانات وصفية اختيارية"""
+        entry = {
+            "key": key,
+            "value": value,
+            "meta": meta or {},
+            "stored_at": time.time(),
+            "ttl": self.default_ttl if ttl is None else ttl
+        }
+        try:
+            await asyncio.to_thread(self._write, key, entry)
+        except OSError as e:
+            logger.error(f"Failed to write cache entry for {key}: {e}")
+
+    async def refresh(self, entry: Dict[str, Any], ttl: Optional[float] = None):
+        """تجديد صلاحية عنصر بعد التحقق من أنه لم يتغير"""
+        await self.set(entry["key"], entry["value"], ttl if ttl is not None else entry["ttl"], entry.get("meta"))
+
+    def _read_all(self) -> List[Dict[str, Any]]:
+        entries = []
+        with self._lock:
+            self._ensure_index()
+            names = list(self._index)
+        for name in names:
+            try:
+                entries.append(read_json(self.directory / name))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    async def entries(self) -> List[Dict[str, Any]]:
+        """قراءة جميع العناصر المخزنة (لإعادة بناء الفهارس المساعدة)"""
+        return await asyncio.to_thread(self._read_all)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_index()
+            return {"entries": len(self._index), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,282 @@
+import os
+import asyncio
+import inspect
+import logging
+from typing import Dict, List, Any, Optional, Sequence
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.persistence import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+ONNX_CONFIG = "embedding_config.json"
+
+class EmbeddingBackend:
+    """واجهة محرك تشغيل نموذج التضمين"""
+
+    name = "base"
+    # محلل الرموز المستخدم في تقسيم المحتوى (يكفي أن يوفر tokenize)
+    tokenizer = None
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+def _set_torch_threads(threads: int):
+    """تحديد عدد خيوط torch داخل العملية الواحدة (0 = الافتراضي)"""
+    import torch
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    return torch
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """تشغيل النموذج عبر PyTorch، مع تكميم ديناميكي int8 اختياري لطبقات Linear"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, threads: int = 0, quantize: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        torch = _set_torch_threads(threads)
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.quantize = quantize
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+        self.tokenizer = self.model.tokenizer
+        self.threads = torch.get_num_threads()
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "model": self.model_name,
+            "quantization": "int8" if self.quantize else "none",
+            "threads": self.threads
+        }
+
+class OnnxBackend(EmbeddingBackend):
+    """تشغيل نموذج مُصدَّر عبر onnxruntime دون الحاجة إلى PyTorch"""
+
+    name = "onnx"
+
+    def __init__(self, directory: Path, threads: int = 0, quantize: bool = True):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires: pip install -r requirements-onnx.txt") from e
+        from transformers import AutoTokenizer
+
+        self.directory = Path(directory)
+        config_path = self.directory / ONNX_CONFIG
+        if not config_path.exists():
+            raise FileNotFoundError(
+                f"No exported ONNX model in {self.directory}; run python -m scripts.benchmark_embeddings --export first"
+            )
+        self.config = read_json(config_path)
+
+        # النسخة المكممة إن وُجدت وطُلبت، وإلا النسخة الكاملة
+        model_file = self.directory / "model.int8.onnx"
+        if not (quantize and model_file.exists()):
+            model_file = self.directory / "model.onnx"
+        self.model_file = model_file
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.directory))
+        self.threads = threads
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.config["max_seq_length"],
+            return_tensors="np"
+        )
+        feed = {name: np.asarray(value, dtype=np.int64) for name, value in inputs.items() if name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+
+        # متوسط الرموز الفعلية فقط (نفس تجميع sentence-transformers)
+        mask = feed["attention_mask"][:, :, None].astype(np.float32)
+        embeddings = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config.get("normalize"):
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        # ترتيب النصوص حسب الطول يقلل الحشو داخل كل دفعة
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.zeros((len(texts), self.config["dimension"]), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([texts[i] for i in batch])
+        return embeddings
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "model": self.config.get("model"),
+            "file": self.model_file.name,
+            "threads": self.threads
+        }
+
+def default_onnx_path(model_name: str) -> Path:
+    """مجلد النموذج المُصدَّر (EMBEDDING_ONNX_PATH أو MODEL_PATH/<model>-onnx)"""
+    path = os.getenv("EMBEDDING_ONNX_PATH")
+    if path:
+        return Path(path)
+    return Path(os.getenv("MODEL_PATH", "./storage/models")) / f"{model_name.replace('/', '_')}-onnx"
+
+def create_embedding_backend(model_name: str, backend: Optional[str] = None) -> EmbeddingBackend:
+    """إنشاء محرك التضمين حسب EMBEDDING_BACKEND و EMBEDDING_QUANTIZATION و EMBEDDING_THREADS"""
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "sentence-transformers")).lower()
+    quantize = os.getenv("EMBEDDING_QUANTIZATION", "none").lower() == "int8"
+    threads = int(os.getenv("EMBEDDING_THREADS", "0"))
+    if backend in ("sentence-transformers", "torch"):
+        return SentenceTransformerBackend(model_name, threads=threads, quantize=quantize)
+    if backend == "onnx":
+        return OnnxBackend(default_onnx_path(model_name), threads=threads, quantize=quantize)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+def export_onnx(model_name: str, directory: Path, quantize: bool = True) -> Path:
+    """تصدير نموذج sentence-transformers إلى ONNX مع نسخة int8 اختيارية"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class Encoder(torch.nn.Module):
+        """تمرير المدخلات بالاسم لأن ترتيب معاملات forward يختلف بين إصدارات transformers"""
+
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    # المُصدِّر الجديد (dynamo) في PyTorch الحديث يتطلب onnxscript، لذا نستخدم مُصدِّر التتبع
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    # التتبع لا يعمل مع موترات inference_mode، لذا no_grad
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(),
+            tuple(sample[name] for name in input_names),
+            str(directory / "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **options
+        )
+    tokenizer.save_pretrained(str(directory))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(directory / "model.onnx"),
+            str(directory / "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+
+    config = {
+        "model": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "normalize": any(isinstance(module, Normalize) for module in model)
+    }
+    write_json(directory / ONNX_CONFIG, config)
+    logger.info(f"Exported {model_name} to {directory}")
+    return directory
+
+class EmbeddingService:
+    """مرحلة تضمين مجمّعة تعمل خارج حلقة الأحداث"""
+
+    def __init__(self, model: EmbeddingBackend, batch_size: Optional[int] = None, max_workers: Optional[int] = None):
+        self.model = model
+        self.batch_size = batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        self._dimension: Optional[int] = None
+        # خيط عامل مخصص حتى لا يتنافس النموذج مع مجمّع الخيوط الافتراضي
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("EMBEDDING_WORKERS", "1")),
+            thread_name_prefix="embedding"
+        )
+
+    def _encode_sync(self, texts: List[str]) -> np.ndarray:
+        """تضمين دفعة من النصوص (يعمل داخل الخيط العامل)"""
+        embeddings = self.model.encode(texts, batch_size=self.batch_size)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self._dimension = embeddings.shape[1]
+        return embeddings
+
+    async def dimension(self) -> int:
+        """بعد متجهات النموذج (يُعرف من أول تضمين)"""
+        if self._dimension is None:
+            await self.encode(["dimension"])
+        return self._dimension
+
+    async def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """تضمين مجموعة نصوص باستدعاء واحد للنموذج"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._encode_sync, texts)
+
+    async def encode_one(self, text: str) -> np.ndarray:
+        """تضمين نص واحد"""
+        embeddings = await self.encode([text])
+        return embeddings[0]
+
+    async def encode_documents(self, documents: Sequence[Sequence[str]]) -> List[np.ndarray]:
+        """تضمين أجزاء عدة مستندات دفعة واحدة ثم إعادتها مقسمة لكل مستند"""
+        flat = [chunk for document in documents for chunk in document]
+        embeddings = await self.encode(flat)
+
+        results = []
+        offset = 0
+        for document in documents:
+            results.append(embeddings[offset:offset + len(document)])
+            offset += len(document)
+
+        return results
+
+    def close(self):
+        """إيقاف الخيط العامل"""
+        self._executor.shutdown(wait=False)
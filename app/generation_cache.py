@@ -0,0 +1,131 @@
+import os
+import hashlib
+import logging
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from pathlib import Path
+
+import numpy as np
+
+from app.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+class GenerationCache:
+    """ذاكرة مؤقتة لنتائج توليد الكود بطبقة تطابق تام وطبقة تشابه دلالي اختيارية"""
+
+    def __init__(self, directory: Path, embed: Optional[Callable[[str], Awaitable[Optional[List[float]]]]] = None,
+                 similarity_threshold: Optional[float] = None, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.store = DiskCache(
+            directory,
+            max_bytes=max_bytes or int(os.getenv("GENERATION_CACHE_MAX_MB", "50")) * 1024 * 1024,
+            default_ttl=ttl or float(os.getenv("GENERATION_CACHE_TTL", str(7 * 86400)))
+        )
+        threshold = os.getenv("GENERATION_CACHE_SIMILARITY", "")
+        self.similarity_threshold = similarity_threshold or (float(threshold) if threshold else None)
+        self.embed = embed
+
+        # فهرس دلالي في الذاكرة: (اللغة، بصمة السياق) -> قائمة (المفتاح، المتجه)
+        self._semantic_index: Optional[Dict[tuple, List[tuple]]] = None
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def normalize_task(task: str) -> str:
+        """توحيد نص المهمة"""
+        return " ".join(task.lower().split()).rstrip(".!?")
+
+    @staticmethod
+    def context_hash(context: Optional[str]) -> str:
+        return hashlib.sha256((context or "").encode()).hexdigest()[:16]
+
+    def _key(self, task: str, language: str, context: Optional[str]) -> str:
+        task_hash = hashlib.sha256(self.normalize_task(task).encode()).hexdigest()
+        return f"generation:{language}:{task_hash}:{self.context_hash(context)}"
+
+    async def get(self, task: str, language: str, context: Optional[str] = None) -> Optional[str]:
+        """البحث عن كود مولد سابقاً لنفس المهمة أو لمهمة مشابهة جداً"""
+        # الطبقة الأولى: تطابق تام
+        cached = await self.store.get(self._key(task, language, context))
+        if cached is not None:
+            self.counters["exact_hits"] += 1
+            return cached["code"]
+
+        # الطبقة الثانية: تشابه دلالي
+        if self.similarity_threshold and self.embed:
+            code = await self._semantic_lookup(task, language, context)
+            if code is not None:
+                self.counters["semantic_hits"] += 1
+                return code
+
+        self.counters["misses"] += 1
+        return None
+
+    async def _semantic_lookup(self, task: str, language: str, context: Optional[str]) -> Optional[str]:
+        vector = await self._embed(task)
+        if vector is None:
+            return None
+
+        candidates = (await self._get_semantic_index()).get((language, self.context_hash(context)), [])
+        if not candidates:
+            return None
+
+        matrix = np.stack([candidate_vector for _, candidate_vector in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        key = candidates[best][0]
+        cached = await self.store.get(key)
+        if cached is None:
+            # العنصر حُذف من القرص أو انتهت صلاحيته، فلا يبقى في الفهرس الدلالي
+            candidates[:] = [item for item in candidates if item[0] != key]
+            return None
+        return cached["code"]
+
+    async def _embed(self, task: str) -> Optional[np.ndarray]:
+        """تضمين المهمة كمتجه مُطبَّع، أو None إذا لم يكن النموذج جاهزاً"""
+        embedding = await self.embed(self.normalize_task(task))
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def _get_semantic_index(self) -> Dict[tuple, List[tuple]]:
+        """إعادة بناء الفهرس الدلالي من القرص عند أول استخدام"""
+        if self._semantic_index is None:
+            self._semantic_index = {}
+            for entry in await self.store.entries():
+                value = entry.get("value") or {}
+                if value.get("embedding") and self.store.is_fresh(entry):
+                    self._add_to_index(entry["key"], value)
+        return self._semantic_index
+
+    def _add_to_index(self, key: str, value: Dict[str, Any]):
+        bucket = self._semantic_index.setdefault((value["language"], value["context_hash"]), [])
+        bucket[:] = [item for item in bucket if item[0] != key]
+        bucket.append((key, np.asarray(value["embedding"], dtype=np.float32)))
+
+    async def set(self, task: str, language: str, context: Optional[str], code: str):
+        """تخزين كود مولد"""
+        key = self._key(task, language, context)
+        value = {
+            "code": code,
+            "task": task,
+            "language": language,
+            "context_hash": self.context_hash(context)
+        }
+
+        if self.similarity_threshold and self.embed:
+            vector = await self._embed(task)
+            if vector is not None:
+                value["embedding"] = vector.tolist()
+                if self._semantic_index is not None:
+                    self._add_to_index(key, value)
+
+        await self.store.set(key, value)
+        self.counters["stores"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "similarity_threshold": self.similarity_threshold, **self.store.stats()}
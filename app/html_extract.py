@@ -0,0 +1,112 @@
+import re
+import logging
+from typing import List, Optional
+
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# العناصر التي لا تحتوي على محتوى مفيد
+UNWANTED_TAGS = ("script", "style", "nav", "footer", "header")
+# العناصر التي تبدأ فقرة جديدة في النص المستخرج
+BLOCK_TAGS = (
+    "p", "div", "section", "article", "main", "aside", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6",
+    "ul", "ol", "li", "dl", "dt", "dd", "table", "tr", "figure", "figcaption", "hr", "br"
+)
+CODE_LANGUAGE = re.compile(r"(?:language|lang|highlight-source)-([\w+#-]+)")
+# علامات داخلية لا تظهر في النص: حد الفقرة وموضع كتلة الكود رقم n
+PARAGRAPH = "\x01"
+CODE_MARK = re.compile(r"\x02(\d+)\x02")
+
+def html_to_text(html: str, max_chars: int = 2_000_000) -> str:
+    """تحويل HTML إلى نص نظيف تفصل فقراته أسطر فارغة وتُسيّج كتل الكود فيه بـ ```
+
+    دالة على مستوى الوحدة حتى يمكن تمريرها إلى مجمّع العمليات.
+    """
+    # حد أقصى لحجم المستند حتى تبقى كلفة التحليل محدودة
+    html = html[:max_chars]
+    if not html.strip():
+        return ""
+
+    code_blocks: List[str] = []
+    try:
+        text = _lxml_text(html, code_blocks)
+    except (etree.ParserError, ValueError) as e:
+        # lxml يرفض بعض المستندات (مثل النصوص التي تحمل تصريح ترميز)
+        logger.debug(f"lxml fast path failed, falling back to BeautifulSoup: {e}")
+        code_blocks = []
+        text = _soup_text(html, code_blocks)
+
+    return _clean_text(text, code_blocks)
+
+def _code_language(*classes: Optional[str]) -> str:
+    """وسم اللغة من أصناف CSS الشائعة (language-python، lang-js ...)"""
+    for value in classes:
+        match = CODE_LANGUAGE.search(value or "")
+        if match:
+            return match.group(1).lower()
+    return ""
+
+def _fence(code: str, language: str, code_blocks: List[str]) -> str:
+    """حفظ كتلة الكود وإرجاع علامة موضعها بوصفها فقرة مستقلة"""
+    code_blocks.append(f"```{language}\n{code.strip(chr(10))}\n```")
+    return f"{PARAGRAPH}\x02{len(code_blocks) - 1}\x02{PARAGRAPH}"
+
+def _is_code_block(element_tag: str, text: str) -> bool:
+    # <code> داخل السطر يبقى جزءاً من الجملة، و<code> متعدد الأسطر خارج <pre> كتلة
+    return element_tag == "pre" or "\n" in text.strip()
+
+def _lxml_text(html: str, code_blocks: List[str]) -> str:
+    """المسار السريع: lxml مباشرة دون بناء شجرة BeautifulSoup"""
+    root = lxml.html.document_fromstring(html)
+    etree.strip_elements(root, *UNWANTED_TAGS, with_tail=False)
+
+    for element in list(root.iter("pre", "code")):
+        if element.getparent() is None or any(parent.tag == "pre" for parent in element.iterancestors()):
+            continue
+        code = element.text_content()
+        if not _is_code_block(element.tag, code):
+            continue
+        inner = element.find(".//code")
+        language = _code_language(element.get("class"), inner.get("class") if inner is not None else None)
+        tail = element.tail
+        element.clear()
+        element.text = _fence(code, language, code_blocks)
+        element.tail = tail
+
+    for element in root.iter(*BLOCK_TAGS):
+        element.text = PARAGRAPH + (element.text or "")
+        element.tail = PARAGRAPH + (element.tail or "")
+    return root.text_content()
+
+def _soup_text(html: str, code_blocks: List[str]) -> str:
+    """المسار الاحتياطي باستخدام BeautifulSoup"""
+    soup = BeautifulSoup(html, 'lxml')
+    for element in soup(list(UNWANTED_TAGS)):
+        element.decompose()
+
+    for element in soup.find_all(["pre", "code"]):
+        if element.parent is None or element.find_parent("pre"):
+            continue
+        code = element.get_text()
+        if not _is_code_block(element.name, code):
+            continue
+        inner = element.find("code")
+        language = _code_language(" ".join(element.get("class", [])),
+                                  " ".join(inner.get("class", [])) if inner else None)
+        element.replace_with(_fence(code, language, code_blocks))
+
+    for element in soup.find_all(list(BLOCK_TAGS)):
+        element.insert_before(PARAGRAPH)
+        element.insert_after(PARAGRAPH)
+    return soup.get_text()
+
+def _clean_text(text: str, code_blocks: Optional[List[str]] = None) -> str:
+    """توحيد المسافات داخل كل فقرة وفصل الفقرات بسطر فارغ مع إعادة كتل الكود كما هي"""
+    paragraphs = (" ".join(paragraph.split()) for paragraph in text.split(PARAGRAPH))
+    text = "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+    if code_blocks:
+        text = CODE_MARK.sub(lambda match: code_blocks[int(match.group(1))], text)
+    return text
@@ -0,0 +1,198 @@
+import copy
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+from typing import Dict, Any, Optional, Callable, Awaitable
+from pathlib import Path
+from datetime import datetime
+
+from app.persistence import read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """الطابور ممتلئ ولا يقبل مهام جديدة"""
+
+class JobProgress:
+    """تتبع تقدم مهمة تعلم لكل مصدر ولكل جزء"""
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job = job
+        self.changed = False
+        job.setdefault("progress", {"sources": {}, "chunks_done": 0, "chunks_total": 0})
+
+    def _source(self, url: str) -> Dict[str, Any]:
+        return self.job["progress"]["sources"].setdefault(
+            url, {"status": "pending", "chunks_done": 0, "chunks_total": 0}
+        )
+
+    def source(self, url: str, status: str):
+        """تحديث حالة مصدر (pending, fetched, processed, failed)"""
+        self._source(url)["status"] = status
+        self.changed = True
+
+    def chunks(self, url: str, done: int, total: int):
+        """تحديث عدد الأجزاء المعالجة لمصدر"""
+        source = self._source(url)
+        source["chunks_done"] = done
+        source["chunks_total"] = total
+
+        sources = self.job["progress"]["sources"].values()
+        self.job["progress"]["chunks_done"] = sum(s["chunks_done"] for s in sources)
+        self.job["progress"]["chunks_total"] = sum(s["chunks_total"] for s in sources)
+        self.changed = True
+
+class JobQueue:
+    """طابور مهام في الخلفية بأولويات وعدد محدود من العمال، مع حفظ المهام على القرص"""
+
+    def __init__(self, directory: Path, workers: int = 2, max_pending: int = 100,
+                 progress_interval: float = 5.0, retention_days: float = 7.0, max_kept: int = 1000):
+        self.directory = Path(directory)
+        self.workers = workers
+        self.max_pending = max_pending
+        # التقدم يُحفظ على القرص مرة كل progress_interval ثانية على الأكثر أثناء التنفيذ
+        self.progress_interval = progress_interval
+        # ملفات المهام المنتهية تُحذف بعد retention_days يوماً أو عند تجاوز max_kept ملفاً
+        self.retention_days = retention_days
+        self.max_kept = max_kept
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._handler = None
+        self._sequence = itertools.count()
+
+    async def start(self, handler: Callable[[Dict[str, Any], JobProgress], Awaitable[Any]]):
+        """تشغيل العمال"""
+        if self._tasks:
+            return
+        self._handler = handler
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await asyncio.to_thread(self._prune)
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def submit(self, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """إضافة مهمة جديدة (الأولوية الأعلى تُنفذ أولاً)"""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        if self._queue.qsize() >= self.max_pending:
+            raise QueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "priority": priority,
+            "payload": payload,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        JobProgress(job)
+        self.jobs[job["job_id"]] = job
+        await self._persist(job)
+        self._queue.put_nowait((-priority, next(self._sequence), job["job_id"]))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """حالة المهمة من الذاكرة، أو من القرص بعد إعادة التشغيل"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+
+        path = self.directory / f"{job_id}.json"
+        if not path.exists():
+            return None
+        job = await asyncio.to_thread(self._read, path)
+        if job and job["status"] in ("queued", "running"):
+            # المهمة لم تكتمل قبل إعادة تشغيل العملية
+            job["status"] = "interrupted"
+        return job
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat()
+            progress = JobProgress(job)
+            await self._persist(job)
+            flusher = asyncio.create_task(self._flush_progress(job, progress))
+            try:
+                job["result"] = await self._handler(job, progress)
+                job["status"] = "completed"
+            except asyncio.CancelledError:
+                job["status"] = "interrupted"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                flusher.cancel()
+                await asyncio.gather(flusher, return_exceptions=True)
+                job["finished_at"] = datetime.now().isoformat()
+                await self._persist(job)
+                self.jobs.pop(job_id, None)
+                await asyncio.to_thread(self._prune)
+                self._queue.task_done()
+
+    async def _flush_progress(self, job: Dict[str, Any], progress: JobProgress):
+        """حفظ التقدم دورياً حتى يظهر بعد انهيار العملية أثناء المهمة"""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            if progress.changed:
+                progress.changed = False
+                await self._persist(job)
+
+    def _prune(self):
+        """حذف ملفات المهام المنتهية القديمة أو الزائدة عن الحد"""
+        try:
+            files = [path for path in self.directory.glob("*.json") if path.stem not in self.jobs]
+            files.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        except OSError as e:
+            logger.error(f"Failed to list job files: {e}")
+            return
+
+        cutoff = time.time() - self.retention_days * 86400
+        for index, path in enumerate(files):
+            try:
+                if index >= self.max_kept or path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError as e:
+                logger.error(f"Failed to remove job file {path}: {e}")
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return read_json(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read job file {path}: {e}")
+            return None
+
+    def _write(self, job: Dict[str, Any]):
+        write_json(self.directory / f"{job['job_id']}.json", job)
+
+    async def _persist(self, job: Dict[str, Any]):
+        # نسخة ثابتة لأن المعالج قد يعدّل المهمة أثناء الكتابة في خيط آخر
+        snapshot = copy.deepcopy(job)
+        try:
+            await asyncio.to_thread(self._write, snapshot)
+        except OSError as e:
+            logger.error(f"Failed to persist job {job['job_id']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "active": sum(1 for job in self.jobs.values() if job["status"] == "running")
+        }
+
+    async def close(self):
+        """إيقاف العمال"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -1,50 +1,120 @@
 import os
-import json
+import re
+import asyncio
 import pickle
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Iterator, Sequence
 from pathlib import Path
 import hashlib
 from datetime import datetime
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+
+from app.cache import LRUCache, TTLCache
+from app.registry import registry
+from app.topic_store import TopicStore
+from app.chunker import Chunker, word_count
+from app.lexical_index import is_identifier_query
+from app.persistence import KeyedLocks, loads, read_json_async, write_json_async
 
 logger = logging.getLogger(__name__)
 
+# ثابت الدمج في reciprocal rank fusion
+RRF_K = 60
+
+# كلمات تدل على لغة البرمجة في اسم الموضوع أو في وسم كتلة الكود
+LANGUAGE_ALIASES = {
+    "python": ("python", "py", "django", "flask", "fastapi", "pandas", "numpy"),
+    "javascript": ("javascript", "js", "node", "nodejs", "react", "vue", "jsx"),
+    "typescript": ("typescript", "ts", "tsx", "angular"),
+    "java": ("java", "spring", "kotlin"),
+    "cpp": ("cpp", "c++", "cxx"),
+    "csharp": ("csharp", "c#", "cs", "dotnet"),
+    "go": ("go", "golang"),
+    "rust": ("rust", "rs", "cargo"),
+    "php": ("php", "laravel"),
+    "ruby": ("ruby", "rb", "rails")
+}
+ALIAS_TO_LANGUAGE = {alias: language for language, aliases in LANGUAGE_ALIASES.items() for alias in aliases}
+FENCE_LANGUAGE = re.compile(r"```\s*([\w+#-]+)")
+FENCED_BLOCK = re.compile(r"```.*?(?:```|$)", re.S)
+# نسبة الكود المسيّج التي يُعد الجزء عندها كوداً خالصاً يُؤخذ بوسمه
+CODE_ONLY_SHARE = 0.8
+
+def detect_language(topic: str, text: str = "") -> str:
+    """لغة الجزء من اسم الموضوع، ومن وسم كتلة الكود فقط إذا كان الجزء كوداً بالكامل تقريباً، وإلا general"""
+    topic_language = None
+    for word in re.split(r"[^a-z0-9+#]+", topic.lower()):
+        if word in ALIAS_TO_LANGUAGE:
+            topic_language = ALIAS_TO_LANGUAGE[word]
+            break
+    
+    # مقتطف js قصير في شرح عن بايثون لا يجعل الجزء جافاسكريبت
+    match = FENCE_LANGUAGE.search(text)
+    if match and match.group(1).lower() in ALIAS_TO_LANGUAGE:
+        code = sum(len(block.group()) for block in FENCED_BLOCK.finditer(text))
+        if code >= CODE_ONLY_SHARE * len(text.strip()):
+            return ALIAS_TO_LANGUAGE[match.group(1).lower()]
+    return topic_language or "general"
+
 class KnowledgeManager:
     def __init__(self, knowledge_path: Optional[str] = None):
         self.knowledge_path = Path(knowledge_path or os.getenv("KNOWLEDGE_PATH", "./knowledge_base"))
         self.knowledge_path.mkdir(exist_ok=True, parents=True)
+        self.topic_store = TopicStore(self.knowledge_path / "topics")
+        self.topic_locks = KeyedLocks()
+        self.chunker = Chunker(count_tokens=self._count_tokens)
+        self.ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", "64"))
         
-        self.embedding_model = None
-        self.chroma_client = None
-        self.collection = None
+        # ذاكرة مؤقتة لتضمينات الاستعلامات ولنتائج البحث الأخيرة
+        self.query_embedding_cache = LRUCache(int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")))
+        self.results_cache = TTLCache(
+            maxsize=int(os.getenv("RESULTS_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("RESULTS_CACHE_TTL", "60"))
+        )
+        self.top_k = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+        self.min_similarity = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.2"))
         
+    @property
+    def embedding_model(self):
+        return registry.embedding_model
+
+    @property
+    def embedder(self):
+        return registry.embedder
+
+    @property
+    def vector_index(self):
+        return registry.vector_index
+
+    @property
+    def lexical_index(self):
+        return registry.lexical_index
+
     async def initialize(self):
         """تهيئة مدير المعرفة"""
         try:
-            # تحميل نموذج التضمين
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            
-            # تهيئة قاعدة بيانات المتجهات
-            self.chroma_client = chromadb.Client(Settings(
-                persist_directory=str(self.knowledge_path / "chroma_db"),
-                chroma_db_impl="duckdb+parquet"
-            ))
-            
-            # إنشاء أو تحميل المجموعة
-            self.collection = self.chroma_client.get_or_create_collection("knowledge")
-            
+            # النموذج وقاعدة المتجهات مشتركان بين جميع المكونات ويُحمّلان مرة واحدة
+            await registry.get(self.knowledge_path)
             logger.info("Knowledge Manager initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Knowledge Manager: {e}")
             raise
 
+    def start_warmup(self):
+        """بدء تحميل النموذج في الخلفية دون تأخير الجاهزية"""
+        registry.start_warmup(self.knowledge_path)
+
+    async def wait_ready(self):
+        """انتظار تحميل النموذج بواسطة مستخدم آخر دون بدء تحميله"""
+        await registry.wait_ready()
+
+    def status(self) -> Dict[str, Any]:
+        """حالة جاهزية مدير المعرفة"""
+        return registry.status()
+
     async def load_base_knowledge(self):
-        """تحميل المعرفة الأساسية للبرمجة"""
+        """تحميل المعرفة الأساسية للبرمجة (المواضيع غير المتغيرة منذ آخر تشغيل تُتخطى)"""
         base_topics = [
             "python_programming",
             "javascript_programming", 
@@ -57,21 +127,163 @@ class KnowledgeManager:
             "machine_learning_basics"
         ]
         
-        for topic in base_topics:
-            base_path = self.knowledge_path / "base" / f"{topic}.json"
-            if base_path.exists():
+        manifest_path = self.knowledge_path / "base_manifest.json"
+        try:
+            manifest = await read_json_async(manifest_path)
+        except FileNotFoundError:
+            manifest = {}
+        except Exception as e:
+            logger.error(f"Failed to read base knowledge manifest: {e}")
+            manifest = {}
+        
+        # قراءة المواضيع بالتوازي مع حد لعدد الملفات المفتوحة في آن واحد
+        semaphore = asyncio.Semaphore(int(os.getenv("BASE_KNOWLEDGE_CONCURRENCY", "4")))
+        
+        async def read_topic(topic: str):
+            async with semaphore:
                 try:
-                    with open(base_path, 'r', encoding='utf-8') as f:
-                        knowledge = json.load(f)
-                    await self.save_knowledge(topic, knowledge, ["base_knowledge"])
-                    logger.info(f"Loaded base knowledge: {topic}")
+                    return await asyncio.to_thread(self._read_base_topic, topic, manifest.get(topic))
                 except Exception as e:
                     logger.error(f"Failed to load base knowledge {topic}: {e}")
+                    return None, None
+        
+        results = await asyncio.gather(*(read_topic(topic) for topic in base_topics))
+        
+        new_manifest = {}
+        changed = {}
+        for topic, (fingerprint, knowledge) in zip(base_topics, results):
+            if knowledge is not None:
+                changed[topic] = (fingerprint, knowledge)
+            elif fingerprint is not None:
+                new_manifest[topic] = fingerprint
+        
+        if changed:
+            embedded = True
+            try:
+                await self._embed_base_chunks({topic: knowledge for topic, (_, knowledge) in changed.items()})
+            except Exception as e:
+                logger.error(f"Failed to embed base knowledge: {e}")
+                embedded = False
+                # متجهات الملف لم تُتحقق من أبعادها، ومصفوفة غير منتظمة تُفشل حفظ الموضوع
+                for _, knowledge in changed.values():
+                    for chunk in knowledge.get("chunks", []):
+                        if isinstance(chunk, dict):
+                            chunk.pop("embedding", None)
+            
+            await asyncio.gather(*(
+                self.save_knowledge(topic, knowledge, ["base_knowledge"])
+                for topic, (_, knowledge) in changed.items()
+            ))
+            for topic, (fingerprint, _) in changed.items():
+                # بدون التضمين لا نسجل البصمة حتى يُعاد المحاولة في التشغيل القادم
+                if embedded:
+                    new_manifest[topic] = fingerprint
+                logger.info(f"Loaded base knowledge: {topic}")
+        
+        if new_manifest != manifest:
+            try:
+                await write_json_async(manifest_path, new_manifest)
+            except OSError as e:
+                logger.error(f"Failed to write base knowledge manifest: {e}")
+        
+        logger.info(f"Base knowledge: {len(changed)} topics loaded, {len(results) - len(changed)} unchanged or missing")
+
+    def _read_base_topic(self, topic: str, fingerprint: Optional[Dict[str, Any]]):
+        """إرجاع (البصمة، المعرفة)؛ المعرفة None إذا لم يتغير الملف"""
+        base_path = self.knowledge_path / "base" / f"{topic}.json"
+        try:
+            stat = base_path.stat()
+        except FileNotFoundError:
+            return None, None
+        
+        # الحجم ووقت التعديل يكفيان لتخطي الملف دون قراءته
+        if fingerprint and fingerprint["size"] == stat.st_size and fingerprint["mtime_ns"] == stat.st_mtime_ns:
+            return fingerprint, None
+        
+        with open(base_path, 'rb') as f:
+            data = f.read()
+        new_fingerprint = {
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+        if fingerprint and fingerprint["sha256"] == new_fingerprint["sha256"]:
+            return new_fingerprint, None
+        return new_fingerprint, loads(data)
+
+    async def _embed_base_chunks(self, topics: Dict[str, Dict[str, Any]]):
+        """فهرسة أجزاء المعرفة الأساسية الجديدة لجميع المواضيع وتضمين ما يلزم منها دفعة واحدة"""
+        for knowledge in topics.values():
+            chunks = []
+            for chunk in knowledge.get("chunks", []):
+                if isinstance(chunk, str):
+                    chunk = {"content": chunk}
+                if not chunk.get("content"):
+                    continue
+                chunk.setdefault("id", hashlib.md5(chunk["content"].encode()).hexdigest())
+                chunks.append(chunk)
+            knowledge["chunks"] = chunks
+        
+        if not any(knowledge["chunks"] for knowledge in topics.values()):
+            return
+        
+        await self.initialize()
+        
+        existing_ids = await asyncio.to_thread(
+            self._existing_chunk_ids, [chunk["id"] for knowledge in topics.values() for chunk in knowledge["chunks"]]
+        )
+        dimension = await self.embedder.dimension()
+        
+        # الأجزاء المحفوظة بتضمين بنفس بعد النموذج تُفهرس بمتجهها، والباقي يُعاد تضمينه
+        documents = {}
+        ids, vectors, contents, metadatas = [], [], [], []
+        for topic, knowledge in topics.items():
+            documents[topic] = []
+            for chunk in knowledge["chunks"]:
+                if chunk["id"] in existing_ids:
+                    # المتجه المحفوظ في الملف قد يكون قديماً أو ببعد نموذج آخر؛ الفهرس يحمل المتجه الصحيح
+                    chunk.pop("embedding", None)
+                    continue
+                embedding = chunk.get("embedding")
+                if embedding is not None and len(embedding) == dimension:
+                    chunk["embedding"] = np.asarray(embedding, dtype=np.float32)
+                    ids.append(chunk["id"])
+                    vectors.append(chunk["embedding"])
+                    contents.append(chunk["content"])
+                    metadatas.append(self._base_metadata(topic, chunk))
+                else:
+                    documents[topic].append(chunk)
+        
+        stored = len(ids)
+        if any(documents.values()):
+            embeddings = await self.embedder.encode_documents(
+                [[chunk["content"] for chunk in chunks] for chunks in documents.values()]
+            )
+            for (topic, chunks), matrix in zip(documents.items(), embeddings):
+                for chunk, vector in zip(chunks, matrix):
+                    chunk["embedding"] = vector
+                    ids.append(chunk["id"])
+                    vectors.append(chunk["embedding"])
+                    contents.append(chunk["content"])
+                    metadatas.append(self._base_metadata(topic, chunk))
+        
+        if ids:
+            await self._index_chunks(ids, vectors, contents, metadatas)
+        logger.info(f"Indexed {len(ids)} base knowledge chunks ({len(ids) - stored} embedded)")
+
+    @staticmethod
+    def _base_metadata(topic: str, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "topic": topic,
+            "source": "base_knowledge",
+            "language": detect_language(topic, chunk["content"])
+        }
 
-    async def process_content(self, topic: str, content: str, source: str) -> Dict[str, Any]:
-        """معالجة المحتوى واستخلاص المعرفة"""
-        # تقسيم المحتوى إلى أجزاء
-        chunks = self._chunk_content(content)
+    async def process_content(self, topic: str, content: str, source: str,
+                              progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """معالجة المحتوى واستخلاص المعرفة (progress يستقبل عدد الأجزاء المنجزة والإجمالي)"""
+        # الاستيعاب يحتاج إلى النموذج، لذا ننتظر تحميله إن لم يكتمل بعد
+        await self.initialize()
         
         knowledge = {
             "topic": topic,
@@ -85,7 +297,40 @@ class KnowledgeManager:
             "processed_at": datetime.now().isoformat()
         }
         
-        # معالجة كل جزء
+        # العدد الفعلي للأجزاء لا يُعرف إلا بعد انتهاء التقسيم
+        estimated = self.chunker.estimate_count(content)
+        if progress:
+            progress(0, estimated)
+        
+        seen_ids = set()
+        skipped = 0
+        done = 0
+        batch = []
+        
+        # الأجزاء تُنتج تدريجياً وتُضمّن وتُضاف على دفعات بدلاً من تجميع المستند كاملاً
+        for chunk in self._chunk_content(content):
+            batch.append(chunk)
+            if len(batch) < self.ingest_batch_size:
+                continue
+            skipped += await self._ingest_batch(topic, source, batch, knowledge, seen_ids)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, max(done, estimated))
+        
+        if batch:
+            skipped += await self._ingest_batch(topic, source, batch, knowledge, seen_ids)
+            done += len(batch)
+        
+        knowledge["skipped_chunks"] = skipped
+        if progress:
+            progress(done, done)
+        
+        return knowledge
+
+    async def _ingest_batch(self, topic: str, source: str, chunks: List[str],
+                            knowledge: Dict[str, Any], seen_ids: set) -> int:
+        """استخلاص دفعة من الأجزاء وتضمينها وإضافتها، وإرجاع عدد الأجزاء المتخطاة"""
         for chunk in chunks:
             # استخراج النقاط الرئيسية
             key_points = await self._extract_key_points(chunk)
@@ -95,88 +340,197 @@ class KnowledgeManager:
             examples = await self._extract_examples(chunk, topic)
             if examples:
                 knowledge["examples"].extend(examples)
-                
-            # تخزين المتجهات للبحث الدلالي
-            embedding = self.embedding_model.encode(chunk).tolist()
+        
+        # إزالة الأجزاء المكررة داخل المستند وتلك الموجودة مسبقاً في قاعدة المتجهات
+        unique_chunks = {}
+        for chunk in chunks:
             chunk_id = hashlib.md5(chunk.encode()).hexdigest()
-            
+            if chunk_id not in seen_ids:
+                seen_ids.add(chunk_id)
+                unique_chunks[chunk_id] = chunk
+        
+        existing_ids = await asyncio.to_thread(self._existing_chunk_ids, list(unique_chunks))
+        new_ids = [chunk_id for chunk_id in unique_chunks if chunk_id not in existing_ids]
+        new_chunks = [unique_chunks[chunk_id] for chunk_id in new_ids]
+        
+        if not new_chunks:
+            return len(chunks)
+        
+        # تضمين الأجزاء الجديدة فقط خارج حلقة الأحداث (مصفوفة float32 بدلاً من قوائم أعداد بايثون)
+        embeddings = await self.embedder.encode(new_chunks)
+        
+        for chunk_id, chunk, embedding in zip(new_ids, new_chunks, embeddings):
             knowledge["chunks"].append({
                 "id": chunk_id,
                 "content": chunk,
                 "embedding": embedding
             })
-            
-            # إضافة إلى قاعدة المتجهات
-            if self.collection:
-                self.collection.add(
-                    ids=[chunk_id],
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[{"topic": topic, "source": source}]
-                )
         
-        return knowledge
+        # إضافة أجزاء الدفعة إلى الفهارس في عملية واحدة
+        await self._index_chunks(new_ids, embeddings, new_chunks, [
+            {"topic": topic, "source": source, "language": detect_language(topic, chunk)}
+            for chunk in new_chunks
+        ])
+        
+        return len(chunks) - len(new_chunks)
+
+    async def _index_chunks(self, ids: List[str], embeddings: Sequence[np.ndarray], documents: List[str],
+                            metadatas: List[Dict[str, Any]]):
+        """إضافة الأجزاء إلى فهرس المتجهات والفهرس المعجمي خارج حلقة الأحداث"""
+        if not self.vector_index:
+            return
+        # الكتابة إلى الملفات وتقسيم النص لـ BM25 تجري في خيط؛ كل فهرس يحمي حالته بقفله
+        await asyncio.to_thread(self._index_chunks_sync, ids, embeddings, documents, metadatas)
+        # النتائج المخزنة مؤقتاً لم تعد تعكس محتوى الفهارس
+        self.results_cache.clear()
+
+    def _index_chunks_sync(self, ids: List[str], embeddings: Sequence[np.ndarray], documents: List[str],
+                           metadatas: List[Dict[str, Any]]):
+        self.vector_index.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        if self.lexical_index:
+            self.lexical_index.upsert(ids, documents, metadatas)
 
     async def save_knowledge(self, topic: str, knowledge: Dict[str, Any], sources: List[str]):
-        """حفظ المعرفة"""
+        """حفظ المعرفة بإلحاقها إلى سجل الموضوع"""
         try:
-            # إنشاء مجلد للموضوع إذا لم يكن موجوداً
-            topic_path = self.knowledge_path / "topics" / topic
-            topic_path.mkdir(exist_ok=True, parents=True)
-            
-            # حفظ المعرفة بصيغة JSON
-            knowledge_file = topic_path / "knowledge.json"
-            with open(knowledge_file, 'w', encoding='utf-8') as f:
-                json.dump(knowledge, f, ensure_ascii=False, indent=2)
-                
-            # حفظ المصادر
-            sources_file = topic_path / "sources.json"
-            with open(sources_file, 'w', encoding='utf-8') as f:
-                json.dump({"sources": sources}, f, ensure_ascii=False, indent=2)
-                
+            # الحفظ لنفس الموضوع متتالٍ، وللمواضيع المختلفة متوازٍ خارج حلقة الأحداث
+            async with self.topic_locks.lock(topic):
+                await asyncio.to_thread(self.topic_store.append, topic, knowledge, sources)
             logger.info(f"Knowledge saved for topic: {topic}")
         except Exception as e:
             logger.error(f"Failed to save knowledge for {topic}: {e}")
 
-    async def find_relevant_knowledge(self, query: str, language: str = None) -> List[Dict]:
-        """البحث عن معرفة ذات صلة"""
-        if not self.collection:
+    async def load_topic(self, topic: str) -> Optional[Dict[str, Any]]:
+        """قراءة المعرفة المحفوظة لموضوع"""
+        try:
+            async with self.topic_locks.lock(topic):
+                return await asyncio.to_thread(self.topic_store.load, topic)
+        except Exception as e:
+            logger.error(f"Failed to load knowledge for {topic}: {e}")
+            return None
+
+    async def find_relevant_knowledge(self, query: str, language: str = None, n_results: Optional[int] = None,
+                                      topic: Optional[str] = None) -> List[Dict]:
+        """البحث عن معرفة ذات صلة (مرشحة حسب اللغة والموضوع إن وُجدا)"""
+        if not self.vector_index:
+            # لا نؤخر الطلب بانتظار النموذج، بل نبدأ تحميله في الخلفية
+            self.start_warmup()
             return []
             
-        try:
-            # تضمين الاستعلام
-            query_embedding = self.embedding_model.encode(query).tolist()
+        n_results = n_results or self.top_k
+        where = self._build_filter(language, topic)
+        normalized_query = self._normalize_query(query)
+        identifier = is_identifier_query(query)
+        cache_key = (normalized_query, repr(where), n_results, identifier)
+        cached = self.results_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
             
-            # البحث في قاعدة المتجهات
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=5,
-                include=["documents", "metadatas", "distances"]
-            )
+        try:
+            # مرشحون أكثر من كل فهرس حتى يجد الدمج ما يعيد ترتيبه
+            candidates = n_results * 2
+            # البحث وقراءة النصوص من القرص يجريان في خيط حتى لا تتوقف حلقة الأحداث
+            lexical = await asyncio.to_thread(
+                self.lexical_index.search, query, candidates, where
+            ) if self.lexical_index else []
             
-            relevant_knowledge = []
-            for i, doc in enumerate(results["documents"][0]):
-                relevant_knowledge.append({
-                    "content": doc,
-                    "metadata": results["metadatas"][0][i],
-                    "similarity": 1 - results["distances"][0][i]  # تحويل المسافة إلى تشابه
-                })
+            if identifier and lexical:
+                # المعرفات الدقيقة تُخدم من الفهرس المعجمي دون استدعاء نموذج التضمين
+                relevant_knowledge = await asyncio.to_thread(self._with_content, lexical[:n_results])
+            else:
+                # تضمين الاستعلام
+                query_embedding = await self._embed_query(normalized_query)
+                
+                # البحث في فهرس المتجهات مع تمرير المرشح إليه، ثم استبعاد النتائج الضعيفة
+                results = await asyncio.to_thread(self.vector_index.query, query_embedding, candidates, where)
+                dense = [item for item in results if item["similarity"] >= self.min_similarity]
+                relevant_knowledge = await asyncio.to_thread(self._fuse, dense, lexical, n_results)
                 
-            return relevant_knowledge
+            self.results_cache.set(cache_key, relevant_knowledge)
+            return list(relevant_knowledge)
         except Exception as e:
             logger.error(f"Failed to find relevant knowledge: {e}")
             return []
 
-    def _chunk_content(self, content: str, chunk_size: int = 500) -> List[str]:
-        """تقسيم المحتوى إلى أجزاء"""
-        words = content.split()
-        chunks = []
+    def _fuse(self, dense: List[Dict], lexical: List[Dict], n_results: int) -> List[Dict]:
+        """دمج نتائج البحث الدلالي والمعجمي بطريقة reciprocal rank fusion"""
+        scores: Dict[str, float] = {}
+        items: Dict[str, Dict] = {}
+        for results in (dense, lexical):
+            for rank, item in enumerate(results):
+                scores[item["id"]] = scores.get(item["id"], 0.0) + 1 / (RRF_K + rank + 1)
+                # نتيجة البحث الدلالي أولاً لأنها تحمل النص ودرجة التشابه
+                items.setdefault(item["id"], dict(item))
         
-        for i in range(0, len(words), chunk_size):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append(chunk)
+        fused = []
+        for chunk_id in sorted(scores, key=scores.get, reverse=True)[:n_results]:
+            item = items[chunk_id]
+            item["score"] = scores[chunk_id]
+            fused.append(item)
+        return self._with_content(fused)
+
+    def _with_content(self, items: List[Dict]) -> List[Dict]:
+        """إكمال نص الأجزاء القادمة من الفهرس المعجمي من فهرس المتجهات"""
+        missing = [item["id"] for item in items if "content" not in item]
+        if missing:
+            contents = {chunk["id"]: chunk["content"] for chunk in self.vector_index.get(missing)}
+            for item in items:
+                item.setdefault("content", contents.get(item["id"], ""))
+        return items
+
+    @staticmethod
+    def _build_filter(language: Optional[str], topic: Optional[str]) -> Optional[Dict[str, Any]]:
+        """مرشح البيانات الوصفية: أجزاء اللغة المطلوبة والأجزاء العامة فقط"""
+        clauses = []
+        if language:
+            language = ALIAS_TO_LANGUAGE.get(str(language).lower(), str(language).lower())
+            clauses.append({"language": {"$in": [language, "general"]}})
+        if topic:
+            clauses.append({"topic": topic})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    async def embed_text(self, text: str) -> Optional[np.ndarray]:
+        """تضمين نص قصير، أو None إذا لم يكتمل تحميل النموذج بعد"""
+        if not self.embedder:
+            return None
+        return await self._embed_query(self._normalize_query(text))
+
+    async def _embed_query(self, normalized_query: str) -> np.ndarray:
+        """تضمين الاستعلام مع الاستفادة من الذاكرة المؤقتة"""
+        embedding = self.query_embedding_cache.get(normalized_query)
+        if embedding is None:
+            embedding = await self.embedder.encode_one(normalized_query)
+            self.query_embedding_cache.set(normalized_query, embedding)
+        return embedding
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """توحيد نص الاستعلام لاستخدامه كمفتاح للذاكرة المؤقتة"""
+        return " ".join(query.lower().split())
+
+    def _existing_chunk_ids(self, chunk_ids: List[str]) -> set:
+        """إرجاع معرفات الأجزاء الموجودة مسبقاً في قاعدة المتجهات"""
+        if not self.vector_index or not chunk_ids:
+            return set()
             
-        return chunks
+        try:
+            return self.vector_index.existing_ids(chunk_ids)
+        except Exception as e:
+            logger.error(f"Failed to look up existing chunks: {e}")
+            return set()
+
+    def _chunk_content(self, content: str) -> Iterator[str]:
+        """تقسيم المحتوى إلى أجزاء تحترم حدود الفقرات والجمل والكود"""
+        return self.chunker.chunks(content)
+
+    def _count_tokens(self, text: str) -> int:
+        """عد الرموز بمحلل نموذج التضمين، أو بعدد الكلمات قبل تحميله"""
+        tokenizer = getattr(self.embedding_model, "tokenizer", None)
+        if tokenizer is None:
+            return word_count(text)
+        return len(tokenizer.tokenize(text))
 
     async def _extract_key_points(self, content: str) -> List[str]:
         """استخراج النقاط الرئيسية من المحتوى"""
@@ -192,5 +546,4 @@ class KnowledgeManager:
 
     async def close(self):
         """إغلاق الموارد"""
-        if self.chroma_client:
-            self.chroma_client.persist()
\ No newline at end of file
+        await registry.close()
\ No newline at end of file
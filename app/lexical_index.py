@@ -0,0 +1,189 @@
+import os
+import re
+import math
+import heapq
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Sequence
+from pathlib import Path
+
+from app.persistence import dumps, loads, append_log, atomic_write, read_log, read_json, synchronized, write_json
+from app.vector_index import metadata_matches
+
+logger = logging.getLogger(__name__)
+
+# معرفات برمجية (مع النقاط و :: بين أجزائها) أو أرقام أو كلمات بأي لغة
+TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:(?:\.|::)[A-Za-z_][A-Za-z0-9_]*)*|\d+|[^\W\d_]+")
+CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+# استعلام من معرف واحد يحمل علامة برمجية: a_b أو a.b أو a::b أو camelCase أو f() أو ...Error
+IDENTIFIER_QUERY = re.compile(r"^[A-Za-z_][\w.:]*(?:\(\))?$")
+IDENTIFIER_SIGNAL = re.compile(r"[_.]|::|[a-z][A-Z]|\(\)$|(?:Error|Exception)$")
+
+def tokenize(text: str) -> List[str]:
+    """تقسيم يحافظ على المعرف كاملاً ويضيف أجزاءه (pandas.read_csv -> pandas.read_csv, pandas, read_csv, read, csv)"""
+    tokens = []
+    for match in TOKEN.finditer(text):
+        identifier = match.group()
+        tokens.append(identifier.lower())
+        parts = re.split(r"\.|::", identifier)
+        for part in parts if len(parts) > 1 else []:
+            tokens.append(part.lower())
+        for part in parts:
+            pieces = [piece for word in part.split("_") for piece in CAMEL_PART.findall(word)]
+            if len(pieces) > 1:
+                tokens.extend(piece.lower() for piece in pieces)
+    return tokens
+
+def is_identifier_query(query: str) -> bool:
+    """هل الاستعلام معرف برمجي دقيق يكفيه البحث المعجمي"""
+    query = query.strip()
+    return bool(IDENTIFIER_QUERY.match(query) and IDENTIFIER_SIGNAL.search(query))
+
+class LexicalIndex:
+    """فهرس مقلوب مع ترتيب BM25 للأجزاء، يُحدَّث تدريجياً ويُحفظ في سجل إلحاقي"""
+
+    def __init__(self, directory: Path, k1: float = 1.5, b: float = 0.75, compact_ratio: Optional[float] = None):
+        self.directory = Path(directory)
+        self.k1 = k1
+        self.b = b
+        # إعادة كتابة السجل عندما تتجاوز سطوره عدد الأجزاء الحية بهذه النسبة
+        self.compact_ratio = compact_ratio or float(os.getenv("LEXICAL_COMPACT_RATIO", "2"))
+        self._manifest = {"generation": 0, "records": 0, "records_bytes": 0}
+
+        # المصطلح -> {رقم المستند: التكرار}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_index: Dict[str, int] = {}
+        self.doc_lengths: List[int] = []
+        self.doc_terms: List[Dict[str, int]] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._total_length = 0
+        # التحديث والبحث يجريان في خيوط خارج حلقة الأحداث
+        self._lock = threading.RLock()
+        self._load()
+
+    def _records_path(self, generation: int) -> Path:
+        # الجيل 0 يبقى باسمه القديم حتى تُقرأ الفهارس المحفوظة قبل إضافة الضغط
+        return self.directory / ("records.jsonl" if not generation else f"records.{generation}.jsonl")
+
+    def _load(self):
+        try:
+            manifest = read_json(self.directory / "manifest.json")
+        except FileNotFoundError:
+            return
+        manifest.setdefault("generation", 0)
+
+        data = read_log(self._records_path(manifest["generation"]), manifest["records_bytes"])
+        records = 0
+        for line in data.splitlines():
+            if line.strip():
+                record = loads(line)
+                self._apply(record["id"], record["terms"], record["metadata"])
+                records += 1
+        manifest["records"] = records
+        self._manifest = manifest
+        logger.info(f"Lexical index loaded: {len(self.doc_index)} chunks")
+
+    def _apply(self, chunk_id: str, terms: Dict[str, int], metadata: Dict[str, Any]):
+        doc = self.doc_index.get(chunk_id)
+        if doc is None:
+            doc = len(self.doc_ids)
+            self.doc_index[chunk_id] = doc
+            self.doc_ids.append(chunk_id)
+            self.doc_lengths.append(0)
+            self.doc_terms.append({})
+            self.metadatas.append({})
+        else:
+            # إزالة المصطلحات القديمة قبل إعادة الفهرسة
+            for term in self.doc_terms[doc]:
+                self.postings[term].pop(doc, None)
+                if not self.postings[term]:
+                    del self.postings[term]
+
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc] = tf
+        length = sum(terms.values())
+        self._total_length += length - self.doc_lengths[doc]
+        self.doc_lengths[doc] = length
+        self.doc_terms[doc] = terms
+        self.metadatas[doc] = metadata
+
+    @synchronized
+    def upsert(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """فهرسة أجزاء جديدة أو إعادة فهرسة الموجود منها"""
+        records = []
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            terms: Dict[str, int] = {}
+            for token in tokenize(document):
+                terms[token] = terms.get(token, 0) + 1
+            records.append({"id": chunk_id, "terms": terms, "metadata": metadata or {}})
+        if not records:
+            return
+
+        self.directory.mkdir(exist_ok=True, parents=True)
+        data = b"".join(dumps(record) + b"\n" for record in records)
+        self._manifest["records_bytes"] = append_log(
+            self._records_path(self._manifest["generation"]), self._manifest["records_bytes"], data
+        )
+        self._manifest["records"] += len(records)
+        write_json(self.directory / "manifest.json", self._manifest, fsync=False)
+
+        for record in records:
+            self._apply(record["id"], record["terms"], record["metadata"])
+
+        if self._manifest["records"] > self.compact_ratio * max(1, len(self.doc_index)):
+            self.compact()
+
+    @synchronized
+    def compact(self):
+        """إعادة كتابة السجل بسطر واحد لكل جزء حي وحذف السطور التي استُبدلت"""
+        generation = self._manifest["generation"]
+        data = b"".join(
+            dumps({"id": chunk_id, "terms": self.doc_terms[doc], "metadata": self.metadatas[doc]}) + b"\n"
+            for chunk_id, doc in self.doc_index.items()
+        )
+
+        # الجيل الجديد يُكتب في ملف منفصل، والبيان وحده يحدد الملف الصالح
+        atomic_write(self._records_path(generation + 1), data)
+        old_records = self._manifest["records"]
+        self._manifest = {"generation": generation + 1, "records": len(self.doc_index), "records_bytes": len(data)}
+        write_json(self.directory / "manifest.json", self._manifest)
+        try:
+            self._records_path(generation).unlink()
+        except FileNotFoundError:
+            pass
+        logger.info(f"Compacted lexical index: {old_records} records -> {len(self.doc_index)}")
+
+    @synchronized
+    def search(self, query: str, n_results: int, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """أعلى الأجزاء بدرجة BM25 للاستعلام"""
+        n_docs = len(self.doc_ids)
+        if not n_docs or n_results <= 0:
+            return []
+        avg_length = self._total_length / n_docs or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if where:
+            scores = {doc: score for doc, score in scores.items() if metadata_matches(self.metadatas[doc], where)}
+
+        return [
+            {"id": self.doc_ids[doc], "metadata": self.metadatas[doc], "score": score}
+            for doc, score in heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        ]
+
+    @synchronized
+    def count(self) -> int:
+        return len(self.doc_index)
+
+    @synchronized
+    def stats(self) -> Dict[str, Any]:
+        return {"chunks": len(self.doc_index), "terms": len(self.postings)}
@@ -0,0 +1,130 @@
+import os
+import json
+import random
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, AsyncIterator
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# رموز الحالة التي تستحق إعادة المحاولة
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    """خطأ في استدعاء نموذج اللغة"""
+
+class AsyncLLMClient:
+    """عميل غير متزامن لواجهة المحادثة المتوافقة مع OpenAI"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")).rstrip("/")
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "60"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """جلسة واحدة مع مجمّع اتصالات يعاد استخدامه بين الطلبات"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """مهلة الانتظار قبل إعادة المحاولة (تراجع أسي مع عشوائية كاملة)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _open(self, path: str, payload: Dict[str, Any],
+                    timeout: Optional[aiohttp.ClientTimeout] = None) -> aiohttp.ClientResponse:
+        """فتح طلب مع إعادة المحاولة عند الأخطاء المؤقتة، وإرجاع استجابة ناجحة لم تُقرأ بعد"""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                session = await self._get_session()
+                response = await session.post(url, json=payload, timeout=timeout or session.timeout)
+                if response.status == 200:
+                    return response
+
+                async with response:
+                    body = await response.text()
+                error = LLMError(f"LLM request failed with status {response.status}: {body[:200]}")
+                if response.status not in RETRYABLE_STATUS:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = LLMError(f"LLM request failed: {e!r}")
+
+            if attempt == self.max_retries:
+                raise error
+
+            delay = self._backoff(attempt, retry_after)
+            logger.warning(f"{error} - retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """إرسال طلب وإرجاع جسم الاستجابة بصيغة JSON"""
+        async with self._semaphore:
+            response = await self._open(path, payload)
+            async with response:
+                return await response.json()
+
+    async def chat(self, messages: List[Dict], model: str, temperature: float = 0.7,
+                   max_tokens: Optional[int] = None) -> str:
+        """استدعاء نموذج المحادثة وإرجاع نص الرد"""
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+
+        data = await self._post("/chat/completions", payload)
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Unexpected LLM response: {e!r}")
+
+    async def stream_chat(self, messages: List[Dict], model: str, temperature: float = 0.7,
+                          max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """استدعاء نموذج المحادثة بوضع التدفق وإرجاع أجزاء النص فور وصولها"""
+        payload = {"model": model, "messages": messages, "temperature": temperature, "stream": True}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+
+        # المهلة هنا بين الأجزاء المتتالية وليست على مدة التوليد كاملة
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+        async with self._semaphore:
+            response = await self._open("/chat/completions", payload, timeout)
+            async with response:
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError) as e:
+                        raise LLMError(f"Unexpected LLM stream event: {e!r}")
+                    if delta:
+                        yield delta
+
+    async def close(self):
+        """إغلاق الجلسة"""
+        if self.session and not self.session.closed:
+            await self.session.close()
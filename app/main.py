@@ -1,5 +1,6 @@
 import os
 import logging
+from contextlib import aclosing
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -26,15 +27,21 @@ app.add_middleware(
 async def startup_event():
     try:
         from app.ai_core import AICore
-        from app.knowledge_manager import KnowledgeManager
         
         app.state.ai_core = AICore()
-        app.state.knowledge_manager = KnowledgeManager()
+        # مدير معرفة واحد مشترك بدلاً من نسخة ثانية تحمّل النموذج مرة أخرى
+        app.state.knowledge_manager = app.state.ai_core.knowledge_manager
         await app.state.ai_core.initialize()
         logger.info("AI Core initialized successfully on Render")
     except Exception as e:
         logger.error(f"Failed to initialize AI Core: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    ai_core = getattr(app.state, "ai_core", None)
+    if ai_core:
+        await ai_core.close()
+
 @app.get("/")
 async def root():
     return {
@@ -45,46 +52,39 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    knowledge_manager = getattr(app.state, "knowledge_manager", None)
+    knowledge = knowledge_manager.status() if knowledge_manager else {"ready": False}
+    ai_core = getattr(app.state, "ai_core", None)
     return {
         "status": "healthy", 
         "version": "0.1.0",
-        "platform": "Render.com"
+        "platform": "Render.com",
+        "knowledge_ready": knowledge["ready"],
+        "knowledge": knowledge,
+        "web_pool": ai_core.web_researcher.pool_stats() if ai_core else None,
+        "generation_cache": ai_core.generation_cache.stats() if ai_core else None
     }
 
 from app.models import ResearchRequest, ResearchResponse, CodeGenerationRequest, CodeGenerationResponse
 from fastapi import Request
+from fastapi.responses import StreamingResponse
+import json
 import time
 
+def _ndjson(event: dict) -> bytes:
+    """ترميز حدث واحد كسطر JSON"""
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
 @app.post("/research", response_model=ResearchResponse)
 async def research_endpoint(request: Request, body: ResearchRequest):
     try:
-        web_researcher = app.state.ai_core.web_researcher
-        results = await web_researcher.search(
+        research = await app.state.ai_core.research(
             query=body.query,
             max_results=body.max_results,
-            focus_on=body.focus_on
-        )
-        summary = None
-        key_insights = []
-        sources_count = len(results)
-        if body.include_content:
-            for result in results:
-                try:
-                    content = await web_researcher.extract_content(result["url"])
-                    if content:
-                        result["content"] = content[:1000]
-                        key_insights.append(content[:200])
-                except Exception:
-                    continue
-            if key_insights:
-                summary = " ".join(key_insights[:3])
-        return ResearchResponse(
-            query=body.query,
-            results=results,
-            summary=summary,
-            key_insights=key_insights,
-            sources_count=sources_count
+            focus_on=body.focus_on,
+            include_content=body.include_content
         )
+        return ResearchResponse(query=body.query, **research)
     except Exception as e:
         logger.error(f"Research endpoint error: {e}")
         return ResearchResponse(
@@ -95,6 +95,29 @@ async def research_endpoint(request: Request, body: ResearchRequest):
             sources_count=0
         )
 
+@app.post("/research/stream")
+async def research_stream_endpoint(request: Request, body: ResearchRequest):
+    """نسخة متدفقة من /research بصيغة NDJSON: النتائج أولاً ثم محتوى كل صفحة فور اكتماله ثم الملخص"""
+    async def events():
+        try:
+            research = app.state.ai_core.web_researcher.research_events(
+                body.query, body.max_results, body.focus_on, body.include_content
+            )
+            async with aclosing(research):
+                async for event in research:
+                    if event["type"] == "content" and await request.is_disconnected():
+                        return
+                    if event["type"] == "summary":
+                        # النتائج أُرسلت في أحداث result، فلا نكررها في الملخص
+                        event.pop("results")
+                        event["query"] = body.query
+                    yield _ndjson(event)
+        except Exception as e:
+            logger.error(f"Research stream error: {e}")
+            yield _ndjson({"type": "error", "message": str(e)})
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/generate", response_model=CodeGenerationResponse)
 async def generate_endpoint(request: Request, body: CodeGenerationRequest):
     start_time = time.time()
@@ -127,8 +150,53 @@ async def generate_endpoint(request: Request, body: CodeGenerationRequest):
             execution_time=execution_time
         )
 
+@app.post("/generate/stream")
+async def generate_stream_endpoint(request: Request, body: CodeGenerationRequest):
+    """توليد الكود بوضع التدفق بصيغة NDJSON مع توقيت أول جزء والزمن الكلي في الإطار الأخير"""
+    start_time = time.time()
+    
+    async def events():
+        time_to_first_token = None
+        try:
+            async for piece in app.state.ai_core.generate_code_stream(
+                task=body.task,
+                language=body.language.value,
+                context=body.context
+            ):
+                if time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                yield _ndjson({"type": "token", "content": piece})
+                
+            yield _ndjson({
+                "type": "done",
+                "language": body.language.value,
+                "time_to_first_token": time_to_first_token,
+                "execution_time": time.time() - start_time
+            })
+        except Exception as e:
+            logger.error(f"Code generation stream error: {e}")
+            yield _ndjson({
+                "type": "error",
+                "message": str(e),
+                "execution_time": time.time() - start_time
+            })
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 from app.models import LearningRequest, LearningResponse
 
+def _public_knowledge(knowledge: dict) -> dict:
+    """تحويل تضمينات الأجزاء (مصفوفات float32) إلى قوائم قابلة للترميز في الرد"""
+    if not knowledge.get("chunks"):
+        return knowledge
+    return {
+        **knowledge,
+        "chunks": [
+            {**chunk, "embedding": chunk["embedding"].tolist()} if hasattr(chunk.get("embedding"), "tolist") else chunk
+            for chunk in knowledge["chunks"]
+        ]
+    }
+
 @app.post("/learn", response_model=LearningResponse)
 async def learn_endpoint(request: Request, body: LearningRequest):
     try:
@@ -144,7 +212,7 @@ async def learn_endpoint(request: Request, body: LearningRequest):
         confidence_score = 0.85 if learned_data else 0.0
         return LearningResponse(
             topic=body.topic,
-            knowledge_acquired=learned_data,
+            knowledge_acquired=_public_knowledge(learned_data),
             sources_used=sources_used,
             key_concepts=key_concepts,
             related_topics=related_topics,
@@ -161,6 +229,45 @@ async def learn_endpoint(request: Request, body: LearningRequest):
             confidence_score=0.0
         )
 
+from app.models import LearningJobRequest, LearningJobStatus
+from app.job_queue import QueueFull
+
+def _job_status(job: dict) -> LearningJobStatus:
+    return LearningJobStatus(
+        job_id=job["job_id"],
+        status=job["status"],
+        topic=job["payload"]["topic"],
+        priority=job["priority"],
+        progress=job.get("progress", {}),
+        result=job.get("result"),
+        error=job.get("error"),
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at")
+    )
+
+@app.post("/learn/jobs", response_model=LearningJobStatus, status_code=202)
+async def submit_learning_job(request: Request, body: LearningJobRequest):
+    """تشغيل التعلم كمهمة في الخلفية وإرجاع معرّفها فوراً"""
+    try:
+        job = await app.state.ai_core.submit_learning_job(
+            topic=body.topic,
+            sources=body.sources,
+            depth=body.depth.value,
+            priority=body.priority
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _job_status(job)
+
+@app.get("/learn/jobs/{job_id}", response_model=LearningJobStatus)
+async def learning_job_status(job_id: str):
+    """حالة مهمة التعلم وتقدمها لكل مصدر ولكل جزء"""
+    job = await app.state.ai_core.get_learning_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
 from app.models import CodeImprovementRequest, CodeImprovementResponse
 
 @app.post("/improve", response_model=CodeImprovementResponse)
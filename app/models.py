@@ -54,6 +54,23 @@ class LearningResponse(BaseModel):
     related_topics: List[str] = Field(default=[], description="Related topics for further learning")
     confidence_score: float = Field(..., description="Confidence score of the learned knowledge (0-1)")
 
+class LearningJobRequest(LearningRequest):
+    """Request model for background learning jobs"""
+    priority: int = Field(default=0, description="Job priority (higher runs first)", ge=-10, le=10)
+
+class LearningJobStatus(BaseModel):
+    """Status and progress of a background learning job"""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="Job status (queued, running, completed, failed, interrupted)")
+    topic: str = Field(..., description="Topic being learned")
+    priority: int = Field(default=0, description="Job priority")
+    progress: Dict[str, Any] = Field(default={}, description="Per-source and per-chunk progress")
+    result: Optional[Dict[str, Any]] = Field(None, description="Summary of the learned knowledge")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: str = Field(..., description="When the job was submitted")
+    started_at: Optional[str] = Field(None, description="When the job started")
+    finished_at: Optional[str] = Field(None, description="When the job finished")
+
 class CodeImprovementRequest(BaseModel):
     """Request model for code improvement"""
     code: str = Field(..., description="Code to be improved", min_length=10)
@@ -0,0 +1,107 @@
+import os
+import json
+import asyncio
+import logging
+import tempfile
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+from pathlib import Path
+from contextlib import asynccontextmanager
+
+try:
+    import orjson
+except ImportError:  # مكتبة json القياسية تكفي إذا لم تكن orjson متوفرة
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def dumps(obj: Any) -> bytes:
+    """ترميز JSON بصيغة UTF-8 (orjson عند توفرها)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def loads(data: Any) -> Any:
+    """فك ترميز JSON من نص أو بايتات"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def atomic_write(path: Path, data: bytes, fsync: bool = True):
+    """كتابة ملف عبر ملف مؤقت في نفس المجلد ثم استبداله، فلا يبقى ملف مقتطع بعد انهيار"""
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+def read_json(path: Path) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+def write_json(path: Path, obj: Any, fsync: bool = True):
+    atomic_write(path, dumps(obj), fsync)
+
+def append_log(path: Path, committed: int, data: bytes) -> int:
+    """إلحاق بيانات بملف سجل وإرجاع طوله الجديد
+
+    الطول المثبت في البيان هو المرجع؛ الاقتطاع إليه أولاً يتجاهل بقايا أي كتابة سابقة لم تكتمل.
+    """
+    with open(path, 'ab') as f:
+        f.truncate(committed)
+        f.write(data)
+    return committed + len(data)
+
+def read_log(path: Path, committed: int) -> bytes:
+    """قراءة الجزء المثبت في البيان فقط من ملف سجل"""
+    with open(path, 'rb') as f:
+        return f.read(committed)
+
+def synchronized(method: Callable) -> Callable:
+    """تنفيذ الدالة تحت قفل الكائن (self._lock) حتى يمكن استدعاؤها من خيوط متعددة"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+async def read_json_async(path: Path) -> Any:
+    """قراءة JSON خارج حلقة الأحداث"""
+    return await asyncio.to_thread(read_json, path)
+
+async def write_json_async(path: Path, obj: Any, fsync: bool = True):
+    """كتابة JSON ذرية خارج حلقة الأحداث"""
+    await asyncio.to_thread(write_json, path, obj, fsync)
+
+class KeyedLocks:
+    """أقفال منفصلة لكل مفتاح: العمليات على نفس المفتاح متتالية وعلى المفاتيح المختلفة متوازية"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            # حذف القفل عند انتهاء آخر مستخدم حتى لا تتراكم الأقفال
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
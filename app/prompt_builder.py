@@ -0,0 +1,129 @@
+import os
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # التقدير التقريبي يكفي إذا لم تكن المكتبة متوفرة
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# نوافذ السياق المعروفة للنماذج (بالرموز)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385
+}
+
+# الكلفة الإضافية لكل رسالة ولبداية الرد في صيغة المحادثة
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+class PromptBuilder:
+    """بناء رسائل المحادثة ضمن ميزانية محددة من الرموز"""
+
+    def __init__(self, model: str, context_window: Optional[int] = None,
+                 knowledge_budget: Optional[int] = None, max_output_tokens: Optional[int] = None,
+                 min_output_tokens: int = 256):
+        self.model = model
+        self.context_window = context_window or int(
+            os.getenv("PROMPT_CONTEXT_WINDOW", MODEL_CONTEXT_WINDOWS.get(model, 8192))
+        )
+        self.knowledge_budget = knowledge_budget or int(os.getenv("PROMPT_KNOWLEDGE_TOKENS", "1500"))
+        self.max_output_tokens = max_output_tokens or int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "2000"))
+        self.min_output_tokens = min_output_tokens
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            if tiktoken is not None:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        """عدد الرموز في النص"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """اقتطاع النص عند حدود الرموز"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * 4]
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        return sum(self.count_tokens(m["content"]) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_PER_REPLY
+
+    @staticmethod
+    def _shingles(text: str, size: int = 5) -> set:
+        words = re.findall(r"\w+", text.lower())
+        return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+    def select_knowledge(self, knowledge: List[Dict], budget: int) -> List[str]:
+        """اختيار المعرفة الأعلى صلة دون تكرار ضمن الميزانية"""
+        selected = []
+        selected_shingles = []
+        used = 0
+
+        # درجة الدمج عند وجودها، وإلا درجة التشابه
+        for item in sorted(knowledge or [], key=lambda k: k.get("score", k.get("similarity", 0)), reverse=True):
+            content = (item.get("content") or "").strip()
+            if not content:
+                continue
+
+            # تخطي الأجزاء المتداخلة مع ما اخترناه بالفعل
+            shingles = self._shingles(content)
+            if any(len(shingles & other) / min(len(shingles), len(other)) > 0.8 for other in selected_shingles):
+                continue
+
+            remaining = budget - used
+            # رموز إضافية للترقيم ونهاية السطر
+            tokens = self.count_tokens(content) + 4
+            if tokens > remaining:
+                if remaining < 32:
+                    break
+                content = self.truncate(content, remaining - 4)
+                tokens = remaining
+
+            selected.append(content)
+            selected_shingles.append(shingles)
+            used += tokens
+
+        return selected
+
+    def build(self, system_content: str, user_content: str,
+              knowledge: Optional[List[Dict]] = None) -> Tuple[List[Dict], int]:
+        """بناء الرسائل وحساب الحد الأقصى لرموز الرد"""
+        base_messages = [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
+        ]
+        header = "المعرفة ذات الصلة:\n"
+        base_tokens = self.count_messages(base_messages) + self.count_tokens(header)
+        budget = min(self.knowledge_budget, self.context_window - base_tokens - self.min_output_tokens)
+
+        snippets = self.select_knowledge(knowledge, budget) if budget > 0 else []
+        if snippets:
+            user_content += header
+            for i, snippet in enumerate(snippets, 1):
+                user_content += f"{i}. {snippet}\n"
+
+        messages = [base_messages[0], {"role": "user", "content": user_content}]
+        max_tokens = min(self.max_output_tokens, self.context_window - self.count_messages(messages))
+        return messages, max(max_tokens, 1)
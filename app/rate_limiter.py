@@ -0,0 +1,88 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """دلو رموز غير متزامن: معدل ثابت مع سماح بدفعات قصيرة"""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        # القفل في asyncio يخدم المنتظرين بالترتيب، فيبقى التوزيع عادلاً
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """أخذ رمز واحد مع الانتظار عند الحاجة، وإرجاع مدة الانتظار بالثواني"""
+        # الانتظار يشمل الوقوف في طابور القفل خلف الطلبات الأخرى، لا النوم وحده
+        started = time.monotonic()
+        waited = self._lock.locked()
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                waited = True
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - started if waited else 0.0
+
+class HostRateLimiter:
+    """محدد معدل منفصل لكل مضيف حتى لا تعيق المواقع المختلفة بعضها"""
+
+    def __init__(self, default_rate: float = 2.0, default_burst: int = 4,
+                 overrides: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.overrides = overrides or {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def parse_overrides(spec: str) -> Dict[str, Tuple[float, int]]:
+        """تحليل إعدادات بصيغة host=rate:burst,host2=rate:burst"""
+        overrides = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            try:
+                host, limits = item.split("=", 1)
+                rate, _, burst = limits.partition(":")
+                rate, burst = float(rate), int(burst or 1)
+                # معدل صفري يجعل الانتظار قسمة على صفر، والدفعة الصفرية لا تسمح بأي طلب
+                if rate <= 0 or burst <= 0:
+                    raise ValueError(f"rate and burst must be positive: {item}")
+                overrides[host.strip().lower()] = (rate, burst)
+            except ValueError:
+                logger.warning(f"Ignoring invalid rate limit entry: {item}")
+        return overrides
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.overrides.get(host, (self.default_rate, self.default_burst))
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    async def acquire(self, url: str) -> float:
+        """انتظار دور الطلب لمضيف الرابط، وإرجاع مدة الانتظار"""
+        host = (urlparse(url).hostname or url).lower()
+        waited = await self._bucket(host).acquire()
+
+        stats = self._stats.setdefault(host, {"requests": 0, "total_wait": 0.0, "max_wait": 0.0})
+        stats["requests"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        return {host: dict(values) for host, values in self._stats.items()}
@@ -0,0 +1,145 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+from pathlib import Path
+
+from app.embeddings import EmbeddingService, create_embedding_backend
+from app.vector_index import VectorIndex, create_vector_index
+from app.lexical_index import LexicalIndex
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """سجل مشترك على مستوى العملية لنموذج التضمين وقاعدة المتجهات"""
+
+    def __init__(self):
+        self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.embedding_model = None
+        self.embedder = None
+        self.vector_index: Optional[VectorIndex] = None
+        self.lexical_index: Optional[LexicalIndex] = None
+        self.ready = False
+        self.error = None
+        self.knowledge_path: Optional[Path] = None
+        self._lock = None
+        self._ready_event = None
+        self._warmup_task = None
+
+    async def get(self, knowledge_path: Path) -> "ModelRegistry":
+        """إرجاع الموارد المشتركة مع تحميلها عند أول استخدام"""
+        self._check_path(knowledge_path)
+        if self.ready:
+            return self
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if not self.ready:
+                await self._load(knowledge_path)
+        return self
+
+    def _check_path(self, knowledge_path: Path):
+        """الموارد مشتركة لمسار معرفة واحد؛ طلبها لمسار آخر خطأ لا يُتجاهل"""
+        knowledge_path = Path(knowledge_path).resolve()
+        if self.knowledge_path is None:
+            self.knowledge_path = knowledge_path
+        elif knowledge_path != self.knowledge_path:
+            raise ValueError(
+                f"Model registry is bound to {self.knowledge_path}, cannot serve {knowledge_path}"
+            )
+
+    async def wait_ready(self):
+        """الانتظار حتى يكتمل التحميل دون بدئه"""
+        if self.ready:
+            return
+        if self._ready_event is None:
+            self._ready_event = asyncio.Event()
+        await self._ready_event.wait()
+
+    async def _load(self, knowledge_path: Path):
+        """تحميل النموذج وقاعدة المتجهات خارج حلقة الأحداث"""
+        loop = asyncio.get_running_loop()
+        try:
+            # تحميل نموذج التضمين (EMBEDDING_BACKEND)
+            self.embedding_model = await loop.run_in_executor(None, create_embedding_backend, self.model_name)
+            self.embedder = EmbeddingService(self.embedding_model)
+
+            # تحميل فهرس المتجهات (VECTOR_BACKEND)
+            self.vector_index = await loop.run_in_executor(None, create_vector_index, knowledge_path)
+            self.lexical_index = await loop.run_in_executor(None, self._load_lexical_index, knowledge_path)
+
+            self.ready = True
+            self.error = None
+            if self._ready_event is not None:
+                self._ready_event.set()
+            logger.info(f"Model registry loaded: {self.model_name}")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Failed to load model registry: {e}")
+            raise
+
+    def _load_lexical_index(self, knowledge_path: Path) -> LexicalIndex:
+        """تحميل الفهرس المعجمي، وبناؤه من فهرس المتجهات إذا كان فارغاً"""
+        lexical_index = LexicalIndex(knowledge_path / "lexical_index")
+        if not lexical_index.count() and self.vector_index.count():
+            chunks = self.vector_index.get()
+            lexical_index.upsert(
+                [chunk["id"] for chunk in chunks],
+                [chunk["content"] for chunk in chunks],
+                [chunk["metadata"] for chunk in chunks]
+            )
+            logger.info(f"Lexical index rebuilt from {len(chunks)} stored chunks")
+        return lexical_index
+
+    def start_warmup(self, knowledge_path: Path) -> Optional[asyncio.Task]:
+        """بدء التحميل والتسخين في الخلفية دون انتظار"""
+        self._check_path(knowledge_path)
+        if self.ready:
+            return None
+        if self._warmup_task and not self._warmup_task.done():
+            return self._warmup_task
+
+        self._warmup_task = asyncio.create_task(self._warmup(knowledge_path))
+        return self._warmup_task
+
+    async def _warmup(self, knowledge_path: Path):
+        """تحميل الموارد وتمرير دفعة تجريبية عبر النموذج"""
+        try:
+            await self.get(knowledge_path)
+            await self.embedder.encode(["warmup"])
+            logger.info("Model registry warm-up completed")
+        except Exception as e:
+            logger.error(f"Model registry warm-up failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """حالة جاهزية الموارد المشتركة"""
+        return {
+            "ready": self.ready,
+            "warming_up": bool(self._warmup_task and not self._warmup_task.done()),
+            "model": self.model_name,
+            "embedding": self.embedding_model.stats() if self.embedding_model else None,
+            "vector_index": self.vector_index.stats() if self.vector_index else None,
+            "lexical_index": self.lexical_index.stats() if self.lexical_index else None,
+            "error": self.error
+        }
+
+    async def close(self):
+        """إغلاق الموارد المشتركة"""
+        if self._warmup_task and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        if self.embedder:
+            self.embedder.close()
+        if self.vector_index:
+            self.vector_index.close()
+
+        self.embedding_model = None
+        self.embedder = None
+        self.vector_index = None
+        self.lexical_index = None
+        self.knowledge_path = None
+        self._ready_event = None
+        self.ready = False
+
+registry = ModelRegistry()
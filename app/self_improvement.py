@@ -100,7 +100,7 @@ class SelfImprover:
         
         # البحث عن معرفة ذات صلة
         relevant_knowledge = await self.knowledge_manager.find_relevant_knowledge(
-            f"{language} code best practices improvements"
+            f"{language} code best practices improvements", language
         )
         
         for knowledge in relevant_knowledge:
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Hashable
+
+logger = logging.getLogger(__name__)
+
+class TooManyWaiters(Exception):
+    """تجاوز عدد المنتظرين على نفس الطلب الحد المسموح"""
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+class SingleFlight:
+    """دمج الطلبات المتطابقة المتزامنة في تنفيذ واحد ومشاركة نتيجته مع جميع المنتظرين"""
+
+    def __init__(self, key_fn: Callable[..., Hashable], max_waiters: int = 64):
+        self.key_fn = key_fn
+        self.max_waiters = max_waiters
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.counters = {"executions": 0, "coalesced": 0, "rejected": 0}
+
+    async def do(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """تنفيذ الدالة أو الانضمام إلى تنفيذ جارٍ بنفس المفتاح"""
+        key = self.key_fn(*args, **kwargs)
+        flight = self._flights.get(key)
+
+        if flight is not None:
+            if flight.waiters >= self.max_waiters:
+                self.counters["rejected"] += 1
+                raise TooManyWaiters(f"Too many waiters for in-flight request {key!r}")
+            flight.waiters += 1
+            self.counters["coalesced"] += 1
+            try:
+                # الحماية تمنع إلغاء أحد المنتظرين من إلغاء العمل المشترك
+                return await asyncio.shield(flight.future)
+            finally:
+                flight.waiters -= 1
+
+        future = asyncio.ensure_future(fn(*args, **kwargs))
+        self._flights[key] = _Flight(future)
+        future.add_done_callback(lambda _: self._flights.pop(key, None))
+        self.counters["executions"] += 1
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "in_flight": len(self._flights)}
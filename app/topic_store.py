@@ -0,0 +1,205 @@
+import os
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+from app.persistence import dumps, loads, atomic_write, append_log, read_log, read_json, write_json
+
+logger = logging.getLogger(__name__)
+
+class TopicStore:
+    """تخزين معرفة المواضيع في سجل إلحاقي مع ملف ثنائي جانبي للتضمينات
+
+    لكل موضوع مجلد يحتوي على:
+    - manifest.json: الجيل الحالي وعدد الصفوف والسجلات وطول السجل الصالح
+    - log.<gen>.jsonl: سجل إلحاقي، سطر لكل عملية حفظ (بدون التضمينات)
+    - embeddings.<gen>.f32: مصفوفة float32 خام يمكن ربطها بالذاكرة (memmap)
+    """
+
+    def __init__(self, root: Path, compact_after: Optional[int] = None):
+        self.root = Path(root)
+        self.compact_after = compact_after or int(os.getenv("TOPIC_LOG_COMPACT_AFTER", "20"))
+
+    def _topic_dir(self, topic: str) -> Path:
+        return self.root / topic
+
+    @staticmethod
+    def _log_path(topic_dir: Path, manifest: Dict[str, Any]) -> Path:
+        return topic_dir / f"log.{manifest['generation']}.jsonl"
+
+    @staticmethod
+    def _embeddings_path(topic_dir: Path, manifest: Dict[str, Any]) -> Path:
+        return topic_dir / f"embeddings.{manifest['generation']}.f32"
+
+    def _read_manifest(self, topic_dir: Path) -> Dict[str, Any]:
+        try:
+            return read_json(topic_dir / "manifest.json")
+        except FileNotFoundError:
+            return {"generation": 0, "dim": None, "rows": 0, "records": 0, "log_bytes": 0}
+
+    def _write_manifest(self, topic_dir: Path, manifest: Dict[str, Any]):
+        write_json(topic_dir / "manifest.json", manifest)
+
+    def append(self, topic: str, knowledge: Dict[str, Any], sources: List[str]):
+        """إلحاق عملية حفظ جديدة دون إعادة كتابة ما سبق"""
+        topic_dir = self._topic_dir(topic)
+        topic_dir.mkdir(exist_ok=True, parents=True)
+        self._migrate_legacy(topic_dir)
+        manifest = self._append(topic_dir, knowledge, sources)
+
+        if manifest["records"] >= self.compact_after:
+            self.compact(topic)
+
+    def _append(self, topic_dir: Path, knowledge: Dict[str, Any], sources: List[str]) -> Dict[str, Any]:
+        manifest = self._read_manifest(topic_dir)
+        record, matrix = self._split_embeddings(knowledge, manifest)
+        record["saved_at"] = datetime.now().isoformat()
+        record["sources"] = list(dict.fromkeys(list(knowledge.get("sources", [])) + list(sources or [])))
+        line = dumps(record) + b"\n"
+
+        if matrix is not None:
+            append_log(self._embeddings_path(topic_dir, manifest), manifest["rows"] * manifest["dim"] * 4,
+                       matrix.tobytes())
+            manifest["rows"] += len(matrix)
+
+        manifest["log_bytes"] = append_log(self._log_path(topic_dir, manifest), manifest["log_bytes"], line)
+        manifest["records"] += 1
+
+        self._write_manifest(topic_dir, manifest)
+        return manifest
+
+    def _split_embeddings(self, knowledge: Dict[str, Any],
+                          manifest: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        """فصل التضمينات عن السجل وإرجاعها كمصفوفة float32"""
+        record = {key: value for key, value in knowledge.items() if key != "chunks"}
+        chunks = []
+        vectors = []
+        for chunk in knowledge.get("chunks", []):
+            chunk = dict(chunk)
+            embedding = chunk.pop("embedding", None)
+            if embedding is not None:
+                chunk["row"] = manifest["rows"] + len(vectors)
+                vectors.append(embedding)
+            chunks.append(chunk)
+        record["chunks"] = chunks
+
+        if not vectors:
+            return record, None
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if manifest["dim"] is None:
+            manifest["dim"] = int(matrix.shape[1])
+        elif matrix.shape[1] != manifest["dim"]:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match stored {manifest['dim']}")
+        return record, matrix
+
+    def _read_records(self, topic_dir: Path, manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not manifest["records"]:
+            return []
+        data = read_log(self._log_path(topic_dir, manifest), manifest["log_bytes"])
+        return [loads(line) for line in data.splitlines() if line.strip()]
+
+    @staticmethod
+    def _merge(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """دمج السجلات في معرفة واحدة؛ القوائم تُجمع دون تكرار والقيم المفردة يغلب أحدثها"""
+        merged: Dict[str, Any] = {}
+        chunks: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            for key, value in record.items():
+                if key == "chunks":
+                    for chunk in value:
+                        chunks[chunk["id"]] = chunk
+                elif isinstance(value, list):
+                    existing = merged.setdefault(key, [])
+                    existing.extend(item for item in value if item not in existing)
+                else:
+                    merged[key] = value
+        merged["chunks"] = list(chunks.values())
+        return merged
+
+    def load(self, topic: str) -> Optional[Dict[str, Any]]:
+        """قراءة المعرفة المدمجة لموضوع"""
+        topic_dir = self._topic_dir(topic)
+        if not topic_dir.exists():
+            return None
+        self._migrate_legacy(topic_dir)
+
+        records = self._read_records(topic_dir, self._read_manifest(topic_dir))
+        return self._merge(records) if records else None
+
+    def load_embeddings(self, topic: str) -> Tuple[List[str], np.ndarray]:
+        """معرفات الأجزاء مع مصفوفة تضميناتها مربوطة بالذاكرة (بدون نسخها)"""
+        topic_dir = self._topic_dir(topic)
+        manifest = self._read_manifest(topic_dir)
+        if not manifest["rows"]:
+            return [], np.zeros((0, manifest["dim"] or 0), dtype=np.float32)
+
+        ids = [None] * manifest["rows"]
+        for record in self._read_records(topic_dir, manifest):
+            for chunk in record.get("chunks", []):
+                if "row" in chunk:
+                    ids[chunk["row"]] = chunk["id"]
+
+        matrix = np.memmap(self._embeddings_path(topic_dir, manifest), dtype=np.float32, mode='r',
+                           shape=(manifest["rows"], manifest["dim"]))
+        return ids, matrix
+
+    def compact(self, topic: str):
+        """دمج السجل في لقطة واحدة وحذف الصفوف غير المستخدمة من ملف التضمينات"""
+        topic_dir = self._topic_dir(topic)
+        manifest = self._read_manifest(topic_dir)
+        records = self._read_records(topic_dir, manifest)
+        if len(records) <= 1:
+            return
+
+        merged = self._merge(records)
+        new_manifest = {"generation": manifest["generation"] + 1, "dim": manifest["dim"],
+                        "rows": 0, "records": 1, "log_bytes": 0}
+
+        # الجيل الجديد يُكتب في ملفات منفصلة، والبيان وحده يحدد الملفات الصالحة
+        rows = [chunk["row"] for chunk in merged["chunks"] if "row" in chunk]
+        if rows:
+            old_matrix = np.memmap(self._embeddings_path(topic_dir, manifest), dtype=np.float32, mode='r',
+                                   shape=(manifest["rows"], manifest["dim"]))
+            atomic_write(self._embeddings_path(topic_dir, new_manifest),
+                         np.ascontiguousarray(old_matrix[rows]).tobytes())
+            del old_matrix
+            remap = {old_row: new_row for new_row, old_row in enumerate(rows)}
+            for chunk in merged["chunks"]:
+                if "row" in chunk:
+                    chunk["row"] = remap[chunk["row"]]
+            new_manifest["rows"] = len(rows)
+
+        line = dumps(merged) + b"\n"
+        atomic_write(self._log_path(topic_dir, new_manifest), line)
+        new_manifest["log_bytes"] = len(line)
+
+        self._write_manifest(topic_dir, new_manifest)
+
+        for path in (self._log_path(topic_dir, manifest), self._embeddings_path(topic_dir, manifest)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        logger.info(f"Compacted topic {topic}: {len(records)} records, {new_manifest['rows']} embeddings")
+
+    def _migrate_legacy(self, topic_dir: Path):
+        """تحويل ملف knowledge.json القديم إلى السجل الإلحاقي"""
+        legacy_file = topic_dir / "knowledge.json"
+        if not legacy_file.exists() or (topic_dir / "manifest.json").exists():
+            return
+
+        knowledge = read_json(legacy_file)
+        sources = []
+        sources_file = topic_dir / "sources.json"
+        if sources_file.exists():
+            sources = read_json(sources_file).get("sources", [])
+
+        self._append(topic_dir, knowledge, sources)
+        legacy_file.unlink()
+        if sources_file.exists():
+            sources_file.unlink()
+        logger.info(f"Migrated legacy knowledge file for topic {topic_dir.name}")
@@ -0,0 +1,506 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from app.persistence import dumps, loads, append_log, read_log, read_json, synchronized, write_json
+
+logger = logging.getLogger(__name__)
+
+class VectorIndex:
+    """الواجهة المشتركة لفهارس المتجهات"""
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """إضافة أجزاء أو استبدال الموجود منها بنفس المعرف"""
+        raise NotImplementedError
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """المعرفات الموجودة مسبقاً في الفهرس"""
+        raise NotImplementedError
+
+    def query(self, embedding: Sequence[float], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """أقرب الأجزاء إلى المتجه مرتبة حسب التشابه (جيب التمام)
+
+        where مرشح على البيانات الوصفية بصيغة Chroma: {"field": value}
+        أو {"field": {"$in": [...]}} أو {"$and": [...]} / {"$or": [...]}.
+        """
+        raise NotImplementedError
+
+    def get(self, ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """قراءة نص الأجزاء وبياناتها الوصفية حسب المعرف (أو جميعها)"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "rows": self.count()}
+
+    def close(self):
+        """حفظ أي بيانات معلقة وتحرير الموارد"""
+
+def metadata_matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """تقييم مرشح بصيغة Chroma على البيانات الوصفية لجزء واحد"""
+    for key, condition in (where or {}).items():
+        if key == "$and":
+            if not all(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op == "$eq":
+                    matched = metadata.get(key) == value
+                elif op == "$in":
+                    matched = metadata.get(key) in value
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if not matched:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """فهارس أعلى k درجات مرتبة تنازلياً دون ترتيب المصفوفة كاملة"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+def _grow(array: Optional[np.ndarray], size: int, dtype, width: Optional[int] = None) -> np.ndarray:
+    """مصفوفة بسعة لا تقل عن size مع مضاعفة السعة عند الحاجة لتجنب النسخ مع كل إضافة"""
+    if array is not None and len(array) >= size:
+        return array
+    capacity = max(size, 2 * len(array) if array is not None else 1024)
+    grown = np.zeros((capacity, width) if width else capacity, dtype=dtype)
+    if array is not None:
+        grown[:len(array)] = array
+    return grown
+
+def quantize(vectors: np.ndarray, mode: str):
+    """ضغط المتجهات: float16، أو int8 مع معامل مقياس لكل متجه"""
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+class NumpyVectorIndex(VectorIndex):
+    """فهرس متجهات داخل العملية: مصفوفة float32 مطبّعة مربوطة بالذاكرة وبحث بالضرب النقطي
+
+    الملفات في المجلد:
+    - vectors.f32: صفوف المتجهات المطبّعة
+    - records.jsonl: سجل إلحاقي للمعرف والنص والبيانات الوصفية لكل صف (الأحدث يغلب)
+    - manifest.json: البعد وعدد الصفوف وطول السجل الصالح
+
+    مع VECTOR_QUANTIZATION (float16 أو int8) يجري المسح على نسخة مضغوطة في الذاكرة،
+    ثم يُعاد تقييم أفضل المرشحين بالدقة الكاملة من الملف المربوط بالذاكرة.
+    """
+
+    def __init__(self, directory: Path, ivf_lists: Optional[int] = None, nprobe: Optional[int] = None,
+                 ivf_min_rows: Optional[int] = None, quantization: Optional[str] = None,
+                 rescore_factor: Optional[int] = None):
+        self.directory = Path(directory)
+        # تقسيم IVF اختياري للمجموعات الكبيرة (0 = بحث شامل دائماً)
+        self.ivf_lists = ivf_lists if ivf_lists is not None else int(os.getenv("VECTOR_IVF_LISTS", "0"))
+        self.nprobe = nprobe or int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+        self.ivf_min_rows = ivf_min_rows if ivf_min_rows is not None else int(
+            os.getenv("VECTOR_IVF_MIN_ROWS", "20000")
+        )
+        self.quantization = (quantization or os.getenv("VECTOR_QUANTIZATION", "none")).lower()
+        if self.quantization not in ("none", "float16", "int8"):
+            raise ValueError(f"Unknown quantization mode: {self.quantization}")
+        self.rescore_factor = rescore_factor or int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+        self._manifest = {"dim": None, "rows": 0, "records_bytes": 0}
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.metadatas: List[Dict[str, Any]] = []
+        # النصوص تبقى على القرص؛ في الذاكرة موضع آخر سجل لكل صف وطوله فقط
+        self._offsets: Optional[np.ndarray] = None
+        self._lengths: Optional[np.ndarray] = None
+        # البيانات الوصفية المتطابقة (نفس الموضوع والمصدر واللغة) تتشارك كائناً واحداً
+        self._metadata_pool: Dict[tuple, Dict[str, Any]] = {}
+        # فهرس مقلوب للبيانات الوصفية: (الحقل، القيمة) -> الصفوف
+        self._postings: Dict[tuple, set] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._ivf: Optional[Dict[str, Any]] = None
+        # الكتابة والبحث يجريان في خيوط خارج حلقة الأحداث
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _records_path(self) -> Path:
+        return self.directory / "records.jsonl"
+
+    def _load(self):
+        try:
+            self._manifest = read_json(self.directory / "manifest.json")
+        except FileNotFoundError:
+            return
+
+        data = read_log(self._records_path, self._manifest["records_bytes"])
+        rows = self._manifest["rows"]
+        self.ids = [None] * rows
+        self.metadatas = [{}] * rows
+        self._offsets = _grow(None, rows, np.int64)
+        self._lengths = _grow(None, rows, np.int32)
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            if line.strip():
+                self._apply(loads(line), offset, len(line))
+            offset += len(line)
+        logger.info(f"Vector index loaded: {rows} rows")
+
+    def _intern(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            key = tuple(sorted(metadata.items()))
+            return self._metadata_pool.setdefault(key, metadata)
+        except TypeError:
+            # قيم غير قابلة للتجزئة (مثل القوائم) لا تُشارك
+            return metadata
+
+    def _apply(self, record: Dict[str, Any], offset: int, length: int):
+        row = record["row"]
+        # فقط القيم البسيطة قابلة للترشيح
+        for key, value in self.metadatas[row].items():
+            if isinstance(value, (str, int, float, bool)):
+                self._postings.get((key, value), set()).discard(row)
+        for key, value in record["metadata"].items():
+            if isinstance(value, (str, int, float, bool)):
+                self._postings.setdefault((key, value), set()).add(row)
+        self.ids[row] = record["id"]
+        self.metadatas[row] = self._intern(record["metadata"])
+        self._offsets[row] = offset
+        self._lengths[row] = length
+        self.rows[record["id"]] = row
+
+    def _documents(self, rows: Sequence[int]) -> List[str]:
+        """قراءة نصوص الصفوف من سجل السجلات"""
+        documents = []
+        with open(self._records_path, 'rb') as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                documents.append(loads(f.read(int(self._lengths[row])))["document"])
+        return documents
+
+    def _get_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r',
+                                     shape=(self._manifest["rows"], self._manifest["dim"]))
+        return self._matrix
+
+    def _get_codes(self) -> Optional[np.ndarray]:
+        """النسخة المضغوطة من المتجهات (تُبنى من الملف عند أول استعلام)"""
+        if self.quantization == "none":
+            return None
+        if self._codes is None:
+            matrix = self._get_matrix()
+            rows, dim = matrix.shape
+            self._codes = _grow(None, rows, np.float16 if self.quantization == "float16" else np.int8, dim)
+            if self.quantization == "int8":
+                self._scales = _grow(None, rows, np.float32)
+            for i in range(0, rows, 8192):
+                self._store_codes(i, np.asarray(matrix[i:i + 8192]))
+        return self._codes
+
+    def _store_codes(self, first_row: int, vectors: np.ndarray):
+        codes, scales = quantize(vectors, self.quantization)
+        self._codes[first_row:first_row + len(codes)] = codes
+        if scales is not None:
+            self._scales[first_row:first_row + len(scales)] = scales
+
+    def _coarse_scores(self, query: np.ndarray, rows: Optional[np.ndarray], block: int = 1024) -> np.ndarray:
+        """درجات تقريبية من النسخة المضغوطة، على دفعات حتى لا تُنسخ المصفوفة كاملة بالدقة الكاملة"""
+        codes = self._get_codes()
+        codes = codes[:self._manifest["rows"]] if rows is None else codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for i in range(0, len(codes), block):
+            scores[i:i + block] = codes[i:i + block].astype(np.float32) @ query
+        if self._scales is not None:
+            scores *= self._scales[:self._manifest["rows"]] if rows is None else self._scales[rows]
+        return scores
+
+    @synchronized
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        if not len(ids):
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        dim = self._manifest["dim"]
+        if dim is None:
+            dim = self._manifest["dim"] = int(vectors.shape[1])
+        elif vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dim}")
+
+        # آخر تكرار لكل معرف هو المعتمد
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        rows = self._manifest["rows"]
+        updates = []
+        appended = []
+        records = []
+        for chunk_id, i in latest.items():
+            row = self.rows.get(chunk_id)
+            if row is None:
+                row = rows + len(appended)
+                appended.append(i)
+            else:
+                updates.append((row, i))
+            records.append({"row": row, "id": chunk_id, "document": documents[i], "metadata": metadatas[i] or {}})
+
+        self.directory.mkdir(exist_ok=True, parents=True)
+        append_log(self._vectors_path, rows * dim * 4, vectors[appended].tobytes())
+        if updates:
+            with open(self._vectors_path, 'r+b') as f:
+                for row, i in updates:
+                    f.seek(row * dim * 4)
+                    f.write(vectors[i].tobytes())
+
+        lines = [dumps(record) + b"\n" for record in records]
+        offset = self._manifest["records_bytes"]
+        self._manifest["records_bytes"] = append_log(self._records_path, offset, b"".join(lines))
+        self._manifest["rows"] = rows + len(appended)
+        write_json(self.directory / "manifest.json", self._manifest, fsync=False)
+
+        grow = len(appended)
+        self.ids.extend([None] * grow)
+        self.metadatas.extend([{}] * grow)
+        self._offsets = _grow(self._offsets, rows + grow, np.int64)
+        self._lengths = _grow(self._lengths, rows + grow, np.int32)
+        for record, line in zip(records, lines):
+            self._apply(record, offset, len(line))
+            offset += len(line)
+
+        if self._codes is not None:
+            self._codes = _grow(self._codes, rows + grow, self._codes.dtype, dim)
+            if self._scales is not None:
+                self._scales = _grow(self._scales, rows + grow, np.float32)
+            self._store_codes(rows, vectors[appended])
+            for row, i in updates:
+                self._store_codes(row, vectors[i:i + 1])
+
+        self._matrix = None
+        self._update_ivf(vectors[appended], rows, bool(updates))
+
+    @synchronized
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        return {chunk_id for chunk_id in ids if chunk_id in self.rows}
+
+    @synchronized
+    def get(self, ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        rows = range(self._manifest["rows"]) if ids is None else [self.rows[i] for i in ids if i in self.rows]
+        return [
+            {"id": self.ids[row], "content": document, "metadata": self.metadatas[row]}
+            for row, document in zip(rows, self._documents(rows))
+        ]
+
+    @synchronized
+    def query(self, embedding: Sequence[float], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        if not self._manifest["rows"] or n_results <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        matrix = self._get_matrix()
+
+        if where:
+            # المرشح يضيق مساحة البحث قبل حساب أي تشابه، فالبحث الشامل على الصفوف المطابقة يكفي
+            candidates = np.fromiter(sorted(self._match(where)), dtype=np.int64)
+            if not len(candidates):
+                return []
+        else:
+            candidates = self._ivf_candidates(matrix, query)
+
+        if self.quantization != "none":
+            # مسح تقريبي على النسخة المضغوطة ثم إعادة تقييم أفضل المرشحين بالدقة الكاملة
+            pool = _top_k(self._coarse_scores(query, candidates), n_results * self.rescore_factor)
+            candidates = np.sort(pool if candidates is None else candidates[pool])
+
+        if candidates is None:
+            scores = matrix @ query
+            rows = _top_k(scores, n_results)
+            similarities = scores[rows]
+        else:
+            scores = np.asarray(matrix[candidates]) @ query
+            order = _top_k(scores, n_results)
+            rows = candidates[order]
+            similarities = scores[order]
+
+        return [
+            {
+                "id": self.ids[row],
+                "content": document,
+                "metadata": self.metadatas[row],
+                "similarity": float(similarity)
+            }
+            for row, similarity, document in zip(rows, similarities, self._documents(rows))
+        ]
+
+    def _match(self, where: Dict[str, Any]) -> set:
+        """الصفوف المطابقة للمرشح"""
+        matched = []
+        for key, condition in where.items():
+            if key == "$and":
+                matched.extend(self._match(clause) for clause in condition)
+            elif key == "$or":
+                matched.append(set().union(*(self._match(clause) for clause in condition)))
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op == "$eq":
+                        matched.append(self._postings.get((key, value), set()))
+                    elif op == "$in":
+                        matched.append(set().union(*(self._postings.get((key, v), set()) for v in value)))
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+            else:
+                matched.append(self._postings.get((key, condition), set()))
+        if not matched:
+            return set(range(self._manifest["rows"]))
+        return set.intersection(*matched)
+
+    def _ivf_candidates(self, matrix: np.ndarray, query: np.ndarray) -> Optional[np.ndarray]:
+        """الصفوف في أقرب nprobe قوائم، أو None للبحث الشامل"""
+        if not self.ivf_lists or len(matrix) < max(self.ivf_min_rows, self.ivf_lists):
+            return None
+        if self._ivf is None:
+            self._ivf = self._build_ivf(matrix)
+
+        nearest = _top_k(self._ivf["centroids"] @ query, self.nprobe)
+        return np.concatenate([self._ivf["lists"][c] for c in nearest])
+
+    def _build_ivf(self, matrix: np.ndarray) -> Dict[str, Any]:
+        """تجميع k-means كروي على عينة ثم توزيع جميع الصفوف على أقرب مركز"""
+        rng = np.random.default_rng(0)
+        n_lists = min(self.ivf_lists, len(matrix))
+        sample_size = min(len(matrix), n_lists * 64)
+        sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(10):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+
+        assignments = self._assign(matrix, centroids)
+        order = np.argsort(assignments, kind="stable")
+        lists = np.split(order, np.cumsum(np.bincount(assignments, minlength=n_lists))[:-1])
+        logger.info(f"Built IVF index: {n_lists} lists over {len(matrix)} rows")
+        return {"centroids": centroids, "lists": lists, "rows": len(matrix)}
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        # على دفعات حتى لا تُنسخ المصفوفة المربوطة بالذاكرة كاملة
+        return np.concatenate([
+            np.argmax(np.asarray(vectors[i:i + block]) @ centroids.T, axis=1)
+            for i in range(0, len(vectors), block)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def _update_ivf(self, new_vectors: np.ndarray, first_row: int, rows_updated: bool):
+        """إضافة الصفوف الجديدة إلى القوائم، أو إعادة البناء لاحقاً إذا تغير الفهرس كثيراً"""
+        if self._ivf is None:
+            return
+        if rows_updated or self._manifest["rows"] > 2 * self._ivf["rows"]:
+            self._ivf = None
+            return
+        assignments = self._assign(new_vectors, self._ivf["centroids"])
+        for offset, c in enumerate(assignments):
+            self._ivf["lists"][c] = np.append(self._ivf["lists"][c], first_row + offset)
+
+    @synchronized
+    def count(self) -> int:
+        return self._manifest["rows"]
+
+    @synchronized
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "numpy",
+            "rows": self._manifest["rows"],
+            "dim": self._manifest["dim"],
+            "ivf_lists": len(self._ivf["lists"]) if self._ivf else 0,
+            "quantization": self.quantization,
+            "memory_bytes": sum(a.nbytes for a in (self._codes, self._scales, self._offsets, self._lengths)
+                                if a is not None)
+        }
+
+class ChromaVectorIndex(VectorIndex):
+    """فهرس متجهات عبر Chroma (اعتمادية اختيارية)"""
+
+    def __init__(self, directory: Path):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=str(directory))
+        # مسافة جيب التمام حتى يكون 1 - المسافة هو التشابه كما في الفهرس المحلي
+        self.collection = self.client.get_or_create_collection("knowledge", metadata={"hnsw:space": "cosine"})
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        self.collection.upsert(ids=list(ids), embeddings=[list(map(float, e)) for e in embeddings],
+                               documents=list(documents), metadatas=list(metadatas))
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=list(ids), include=[])["ids"])
+
+    def query(self, embedding: Sequence[float], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        results = self.collection.query(
+            query_embeddings=[list(map(float, embedding))],
+            n_results=n_results,
+            where=where or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            {
+                "id": chunk_id,
+                "content": results["documents"][0][i],
+                "metadata": results["metadatas"][0][i],
+                "similarity": 1 - results["distances"][0][i]
+            }
+            for i, chunk_id in enumerate(results["ids"][0])
+        ]
+
+    def get(self, ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        results = self.collection.get(ids=list(ids) if ids is not None else None,
+                                      include=["documents", "metadatas"])
+        return [
+            {"id": chunk_id, "content": results["documents"][i], "metadata": results["metadatas"][i]}
+            for i, chunk_id in enumerate(results["ids"])
+        ]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "chroma", "rows": self.count()}
+
+def create_vector_index(knowledge_path: Path, backend: Optional[str] = None) -> VectorIndex:
+    """إنشاء فهرس المتجهات حسب VECTOR_BACKEND (numpy افتراضياً)"""
+    backend = (backend or os.getenv("VECTOR_BACKEND", "numpy")).lower()
+    if backend == "numpy":
+        return NumpyVectorIndex(Path(knowledge_path) / "vector_index")
+    if backend == "chroma":
+        return ChromaVectorIndex(Path(knowledge_path) / "chroma_db")
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -1,21 +1,74 @@
+import os
 import aiohttp
 import asyncio
 import logging
 import json
-import time
-from typing import List, Dict, Any, Optional
+import multiprocessing
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from urllib.parse import urlparse, urljoin
 import re
 from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-from bs4 import BeautifulSoup
 import requests
 
+from app.html_extract import html_to_text
+from app.disk_cache import DiskCache
+from app.rate_limiter import HostRateLimiter
+
 logger = logging.getLogger(__name__)
 
+class ConnectionProfile:
+    """إعدادات مجمّع الاتصالات والمهل الزمنية لجلسة HTTP"""
+
+    def __init__(self, limit: int = 50, limit_per_host: int = 4, keepalive_timeout: float = 30.0,
+                 dns_cache_ttl: int = 300, connect_timeout: float = 5.0, read_timeout: float = 15.0,
+                 total_timeout: float = 30.0, max_body_bytes: int = 5 * 1024 * 1024):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_body_bytes = max_body_bytes
+
+    @classmethod
+    def from_env(cls) -> "ConnectionProfile":
+        """بناء الإعدادات من متغيرات البيئة"""
+        return cls(
+            limit=int(os.getenv("HTTP_POOL_LIMIT", "50")),
+            limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "4")),
+            keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")),
+            dns_cache_ttl=int(os.getenv("HTTP_DNS_CACHE_TTL", "300")),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "15")),
+            total_timeout=float(os.getenv("HTTP_TOTAL_TIMEOUT", "30")),
+            max_body_bytes=int(os.getenv("HTTP_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+        )
+
+    def build_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+
+    def build_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+
 class WebResearcher:
-    def __init__(self):
+    def __init__(self, profile: Optional[ConnectionProfile] = None):
         self.session = None
+        self.profile = profile or ConnectionProfile.from_env()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -29,18 +82,42 @@ class WebResearcher:
             "bing": "https://api.bing.microsoft.com/v7.0/search",
             "google": "https://www.googleapis.com/customsearch/v1"
         }
-        self.rate_limit_delay = 1.0  # seconds between requests
-        self.last_request_time = 0
+        # حد معدل لكل مضيف؛ واجهة DuckDuckGo تبقى على طلب واحد في الثانية
+        self.rate_limiter = HostRateLimiter(
+            default_rate=float(os.getenv("RATE_LIMIT_DEFAULT_RATE", "2")),
+            default_burst=int(os.getenv("RATE_LIMIT_DEFAULT_BURST", "4")),
+            overrides={
+                "api.duckduckgo.com": (1.0, 1),
+                **HostRateLimiter.parse_overrides(os.getenv("RATE_LIMITS", ""))
+            }
+        )
+        # حدود جلب الصفحات بالتوازي
+        self.fetch_concurrency = int(os.getenv("RESEARCH_CONCURRENCY", "8"))
+        self.fetch_per_host = int(os.getenv("RESEARCH_PER_HOST_CONCURRENCY", "2"))
+        self.fetch_timeout = float(os.getenv("RESEARCH_URL_TIMEOUT", "15"))
+        # تحليل HTML في مجمّع عمليات محدود بدلاً من حلقة الأحداث
+        self.max_html_chars = int(os.getenv("MAX_HTML_CHARS", "2000000"))
+        self.parse_workers = int(os.getenv("HTML_PARSE_WORKERS", str(min(2, os.cpu_count() or 1))))
+        self._parse_pool = None
+        # ذاكرة مؤقتة دائمة لنتائج البحث والصفحات المستخرجة
+        self.http_cache = DiskCache(
+            Path(os.getenv("KNOWLEDGE_PATH", "./knowledge_base")) / "http_cache",
+            max_bytes=int(os.getenv("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024,
+            default_ttl=float(os.getenv("HTTP_CACHE_TTL", "86400"))
+        )
+        self.search_cache_ttl = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
         
     async def initialize(self):
         """تهيئة باحث الويب"""
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=self.profile.build_connector(),
+            timeout=self.profile.build_timeout()
+        )
         logger.info("Web Researcher initialized successfully")
         
     async def search(self, query: str, max_results: int = 5, focus_on: Optional[List[str]] = None) -> List[Dict]:
         """البحث على الإنترنت مع إمكانيات محسنة"""
-        await self._rate_limit()
-        
         try:
             # محاولة استخدام DuckDuckGo API أولاً
             results = await self._search_duckduckgo(query, max_results)
@@ -73,23 +150,38 @@ class WebResearcher:
                 'skip_disambig': '1'
             }
             
-            async with self.session.get(self.search_engines["duckduckgo"], params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    results = []
-                    
-                    # استخراج النتائج من الاستجابة
-                    if 'RelatedTopics' in data:
-                        for topic in data['RelatedTopics'][:max_results]:
-                            if isinstance(topic, dict) and 'Text' in topic:
-                                results.append({
-                                    'title': topic.get('Text', '')[:100] + '...',
-                                    'url': topic.get('FirstURL', ''),
-                                    'snippet': topic.get('Text', ''),
-                                    'source': 'DuckDuckGo'
-                                })
+            cache_key = f"search:duckduckgo:{query}"
+            cached = await self.http_cache.get_entry(cache_key)
+            
+            if cached and self.http_cache.is_fresh(cached):
+                data = cached["value"]
+            else:
+                headers = self._conditional_headers(cached)
+                await self._rate_limit(self.search_engines["duckduckgo"])
+                async with self.session.get(self.search_engines["duckduckgo"], params=params, headers=headers) as response:
+                    if response.status == 304 and cached:
+                        data = cached["value"]
+                        await self.http_cache.refresh(cached, self.search_cache_ttl)
+                    elif response.status == 200:
+                        data = await response.json()
+                        await self.http_cache.set(cache_key, data, self.search_cache_ttl, self._validators(response))
+                    else:
+                        return []
                     
-                    return results
+            results = []
+            
+            # استخراج النتائج من الاستجابة
+            if 'RelatedTopics' in data:
+                for topic in data['RelatedTopics'][:max_results]:
+                    if isinstance(topic, dict) and 'Text' in topic:
+                        results.append({
+                            'title': topic.get('Text', '')[:100] + '...',
+                            'url': topic.get('FirstURL', ''),
+                            'snippet': topic.get('Text', ''),
+                            'source': 'DuckDuckGo'
+                        })
+            
+            return results
                     
         except Exception as e:
             logger.error(f"DuckDuckGo search failed: {e}")
@@ -138,39 +230,37 @@ class WebResearcher:
         filtered_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
         return filtered_results
 
-    async def _rate_limit(self):
-        """تطبيق حد معدل الطلبات"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.rate_limit_delay:
-            await asyncio.sleep(self.rate_limit_delay - time_since_last)
-        
-        self.last_request_time = time.time()
+    async def _rate_limit(self, url: str) -> float:
+        """تطبيق حد معدل الطلبات الخاص بمضيف الرابط"""
+        waited = await self.rate_limiter.acquire(url)
+        if waited > 0:
+            logger.debug(f"Rate limited request to {url} for {waited:.3f}s")
+        return waited
     
     async def extract_content(self, url: str) -> str:
         """استخراج المحتوى من URL"""
         if not self.session:
             await self.initialize()
             
+        cache_key = f"page:{url}"
+        cached = await self.http_cache.get_entry(cache_key)
+        if cached and self.http_cache.is_fresh(cached):
+            return cached["value"]
+            
         try:
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'lxml')
-                    
-                    # إزالة العناصر غير المرغوب فيها
-                    for element in soup(["script", "style", "nav", "footer", "header"]):
-                        element.decompose()
-                    
-                    # استخراج النص الرئيسي
-                    text = soup.get_text()
-                    
-                    # تنظيف النص
-                    lines = (line.strip() for line in text.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    text = ' '.join(chunk for chunk in chunks if chunk)
+            headers = self._conditional_headers(cached)
+            await self._rate_limit(url)
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    # المحتوى لم يتغير منذ آخر جلب
+                    await self.http_cache.refresh(cached)
+                    return cached["value"]
+                elif response.status == 200:
+                    html = await self._read_body(response)
+                    text = await self._parse_html(html)
                     
+                    if text:
+                        await self.http_cache.set(cache_key, text, meta=self._validators(response))
                     return text
                 else:
                     logger.error(f"Failed to fetch URL: {url}, Status: {response.status}")
@@ -179,8 +269,152 @@ class WebResearcher:
             logger.error(f"Failed to extract content from {url}: {e}")
             return ""
     
+    @staticmethod
+    def _conditional_headers(cached: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """ترويسات إعادة التحقق الشرطي من عنصر مخزن"""
+        headers = {}
+        if cached:
+            meta = cached.get("meta", {})
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+    
+    @staticmethod
+    def _validators(response) -> Dict[str, str]:
+        """استخراج ETag و Last-Modified من الاستجابة"""
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+    
+    async def _read_body(self, response) -> str:
+        """قراءة جسم الاستجابة تدريجياً مع اقتطاعه عند الحد الأقصى"""
+        max_bytes = self.profile.max_body_bytes
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            chunk = chunk[:max_bytes - size]
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                logger.warning(f"Response from {response.url} truncated at {max_bytes} bytes")
+                break
+        return b"".join(chunks).decode(response.charset or "utf-8", errors="replace")
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """إحصائيات مجمّع الاتصالات وحدود المعدل والذاكرة المؤقتة"""
+        connector = self.session.connector if self.session else None
+        stats = {
+            "initialized": connector is not None,
+            "limit": self.profile.limit,
+            "limit_per_host": self.profile.limit_per_host,
+            "rate_limits": self.rate_limiter.stats(),
+            "http_cache": self.http_cache.stats()
+        }
+        if connector is not None:
+            # aiohttp لا يوفر واجهة عامة لعدد الاتصالات، لذا نقرأ الحالة الداخلية بحذر
+            stats["active_connections"] = len(getattr(connector, "_acquired", ()))
+            stats["idle_connections"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        return stats
+    
+    async def _parse_html(self, html: str) -> str:
+        """تحويل HTML إلى نص خارج حلقة الأحداث"""
+        # الاقتطاع قبل الإرسال يقلل كلفة نقل المستند إلى العملية العاملة
+        html = html[:self.max_html_chars]
+        loop = asyncio.get_running_loop()
+        
+        if self.parse_workers <= 0:
+            return await loop.run_in_executor(None, html_to_text, html, self.max_html_chars)
+            
+        if self._parse_pool is None:
+            # fork من عملية متعددة الخيوط (النموذج، to_thread) قد يورث قفلاً محجوزاً للعملية الابنة
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context(method)
+            )
+            
+        try:
+            return await loop.run_in_executor(self._parse_pool, html_to_text, html, self.max_html_chars)
+        except BrokenProcessPool:
+            logger.error("HTML parse pool crashed, recreating it")
+            self._parse_pool = None
+            return await loop.run_in_executor(None, html_to_text, html, self.max_html_chars)
+    
+    async def research_events(self, query: str, max_results: int = 5, focus_on: Optional[List[str]] = None,
+                              include_content: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """مراحل البحث كأحداث: كل نتيجة، ثم محتوى كل صفحة فور اكتماله، ثم الملخص (مشتركة بين /research ونسخته المتدفقة)"""
+        results = await self.search(query=query, max_results=max_results, focus_on=focus_on)
+        for result in results:
+            yield {"type": "result", "result": result}
+
+        key_insights = []
+        if include_content:
+            results_by_url = self.group_by_url(results)
+            async for url, content in self.extract_many(list(results_by_url)):
+                if content:
+                    for result in results_by_url[url]:
+                        result["content"] = content[:1000]
+                    key_insights.append(content[:200])
+                    yield {"type": "content", "url": url, "content": content[:1000]}
+
+        yield {
+            "type": "summary",
+            "results": results,
+            "summary": " ".join(key_insights[:3]) if key_insights else None,
+            "key_insights": key_insights,
+            "sources_count": len(results)
+        }
+
+    @staticmethod
+    def group_by_url(results: List[Dict]) -> Dict[str, List[Dict]]:
+        """تجميع نتائج البحث حسب الرابط لجلب كل صفحة مرة واحدة"""
+        results_by_url = {}
+        for result in results:
+            results_by_url.setdefault(result["url"], []).append(result)
+        return results_by_url
+    
+    async def extract_many(self, urls: List[str], concurrency: Optional[int] = None,
+                           per_host: Optional[int] = None,
+                           per_url_timeout: Optional[float] = None) -> AsyncIterator[Tuple[str, str]]:
+        """استخراج المحتوى من عدة روابط بالتوازي وإرجاع كل نتيجة فور اكتمالها"""
+        if not self.session:
+            await self.initialize()
+            
+        per_url_timeout = per_url_timeout or self.fetch_timeout
+        per_host = per_host or self.fetch_per_host
+        semaphore = asyncio.Semaphore(concurrency or self.fetch_concurrency)
+        host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        async def fetch(url: str) -> Tuple[str, str]:
+            host_semaphore = host_semaphores.setdefault(urlparse(url).netloc, asyncio.Semaphore(per_host))
+            async with semaphore, host_semaphore:
+                try:
+                    return url, await asyncio.wait_for(self.extract_content(url), per_url_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timed out extracting content from {url} after {per_url_timeout}s")
+                except Exception as e:
+                    logger.error(f"Failed to extract content from {url}: {e}")
+                return url, ""
+        
+        # إزالة الروابط المكررة مع الحفاظ على الترتيب
+        tasks = [asyncio.create_task(fetch(url)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # إلغاء ما تبقى إذا توقف المستدعي عن الاستهلاك مبكراً، وانتظاره حتى تُحرر اتصالاته
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
     async def close(self):
         """إغلاق الجلسة"""
         if self.session:
             await self.session.close()
             logger.info("Web Researcher session closed")
+        if self._parse_pool:
+            self._parse_pool.shutdown(wait=False)
+            self._parse_pool = None
@@ -0,0 +1,101 @@
+# scripts/benchmark_embeddings.py (تشغيل من جذر المستودع: python -m scripts.benchmark_embeddings)
+import os
+import sys
+import time
+import argparse
+import resource
+import multiprocessing
+
+import numpy as np
+
+from app.embeddings import OnnxBackend, SentenceTransformerBackend, default_onnx_path, export_onnx
+
+SAMPLE_TEXTS = [
+    "Python lists support append, pop and slicing.",
+    "Use pandas.read_csv to load a CSV file into a DataFrame.",
+    "def add(a, b):\n    return a + b",
+    "JavaScript promises represent the eventual result of an asynchronous operation.",
+    "A binary search tree keeps keys ordered so lookups take logarithmic time.",
+    "HTTP status 404 means the requested resource was not found on the server.",
+    "SQL joins combine rows from two or more tables based on a related column.",
+    "Docker images are built from a Dockerfile, layer by layer."
+]
+
+def _load(name: str, model_name: str, threads: int):
+    if name == "torch":
+        return SentenceTransformerBackend(model_name, threads=threads)
+    if name == "torch-int8":
+        return SentenceTransformerBackend(model_name, threads=threads, quantize=True)
+    if name == "onnx":
+        return OnnxBackend(default_onnx_path(model_name), threads=threads, quantize=False)
+    if name == "onnx-int8":
+        return OnnxBackend(default_onnx_path(model_name), threads=threads, quantize=True)
+    raise ValueError(f"Unknown backend: {name}")
+
+def _run(name, model_name, threads, texts, batch_size, repeats):
+    """تشغيل محرك واحد في عملية مستقلة لقياس ذاكرته بدقة"""
+    started = time.perf_counter()
+    backend = _load(name, model_name, threads)
+    load_seconds = time.perf_counter() - started
+
+    backend.encode(texts[:batch_size], batch_size=batch_size)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        embeddings = backend.encode(texts, batch_size=batch_size)
+    seconds = (time.perf_counter() - started) / repeats
+
+    # ru_maxrss بالكيلوبايت على لينكس
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return embeddings, load_seconds, seconds, peak_mb
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against the PyTorch baseline")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--backends", default="torch-int8,onnx,onnx-int8",
+                        help="backends compared against torch, which always runs first as the reference")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("EMBEDDING_THREADS", "0")))
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--export", action="store_true", help="export the model to ONNX (and int8) first")
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx(args.model, default_onnx_path(args.model))
+        print(f"Exported {args.model} to {default_onnx_path(args.model)}")
+
+    texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(args.texts)]
+    context = multiprocessing.get_context("spawn")
+    baseline = None
+
+    print(f"{'backend':<12}{'load s':>9}{'texts/s':>10}{'speedup':>9}{'peak MB':>9}{'cos mean':>10}{'cos min':>9}")
+    names = ["torch"] + [name for name in args.backends.split(",") if name and name != "torch"]
+    for name in names:
+        with context.Pool(1) as pool:
+            try:
+                embeddings, load_seconds, seconds, peak_mb = pool.apply(
+                    _run, (name, args.model, args.threads, texts, args.batch_size, args.repeats)
+                )
+            except Exception as e:
+                print(f"{name:<12}failed: {e}")
+                if baseline is None:
+                    # بدون المرجع لا معنى لمقارنة التطابق
+                    return 1
+                continue
+
+        if baseline is None:
+            baseline = (embeddings, seconds)
+        cosine = _cosine(embeddings, baseline[0])
+        print(
+            f"{name:<12}{load_seconds:>9.2f}{len(texts) / seconds:>10.1f}{baseline[1] / seconds:>9.2f}"
+            f"{peak_mb:>9.0f}{cosine.mean():>10.4f}{cosine.min():>9.4f}"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
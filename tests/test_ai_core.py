@@ -1,4 +1,91 @@
 # Test cases for ai_core.py
+import asyncio
+
+from app.ai_core import AICore
+
 
 def test_ai_core_init():
     assert True
+
+
+class FakeResearcher:
+    async def extract_many(self, sources):
+        for source in sources:
+            yield source, f"content of {source}"
+
+
+class FakeKnowledgeManager:
+    def __init__(self):
+        self.saved = None
+
+    async def process_content(self, topic, content, source, progress=None):
+        chunks = [{"id": source}] if source == "https://a.example" else []
+        return {
+            "topic": topic,
+            "chunks": chunks,
+            "key_points": [content],
+            "sources": [source],
+            "skipped_chunks": 0 if chunks else 2
+        }
+
+    async def save_knowledge(self, topic, knowledge, sources):
+        self.saved = knowledge
+
+
+def test_learn_topic_merges_every_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_PATH", str(tmp_path))
+    ai = AICore()
+    ai.web_researcher = FakeResearcher()
+    ai.knowledge_manager = FakeKnowledgeManager()
+
+    learned = asyncio.run(ai._learn_topic("lists", ["https://a.example", "https://b.example"]))
+
+    assert learned["chunks"] == [{"id": "https://a.example"}]
+    assert learned["sources"] == ["https://a.example", "https://b.example"]
+    assert len(learned["key_points"]) == 2
+    assert learned["skipped_chunks"] == 2
+    assert ai.knowledge_manager.saved is learned
+
+
+class FakeRetrieval:
+    def __init__(self, ready):
+        self.ready = ready
+
+    def status(self):
+        return {"ready": self.ready}
+
+    async def find_relevant_knowledge(self, task, language):
+        return []
+
+
+class FakeGenerator:
+    async def generate_detailed(self, task, language, context, knowledge):
+        return "print('hi')", True
+
+    async def generate_stream(self, task, language, context, knowledge, outcome=None):
+        for piece in ("print(", "'hi')"):
+            yield piece
+        outcome["from_model"] = True
+
+
+def test_generated_code_cached_only_after_knowledge_is_ready(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_PATH", str(tmp_path))
+    ai = AICore()
+    ai.initialized = True
+    ai.code_generator = FakeGenerator()
+
+    async def run():
+        ai.knowledge_manager = FakeRetrieval(ready=False)
+        await ai._generate_code("say hi")
+        cold = await ai.generation_cache.get("say hi", "python")
+
+        ai.knowledge_manager = FakeRetrieval(ready=True)
+        streamed = [piece async for piece in ai.generate_code_stream("say hi")]
+        return cold, streamed, await ai.generation_cache.get("say hi", "python")
+
+    cold, streamed, warm = asyncio.run(run())
+
+    assert cold is None
+    assert streamed == ["print(", "'hi')"]
+    # التدفق يملأ الذاكرة المؤقتة كما يفعل المسار العادي
+    assert warm == "print('hi')"
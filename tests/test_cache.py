@@ -0,0 +1,25 @@
+# Test cases for cache.py
+import time
+
+from app.cache import LRUCache, TTLCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=4, ttl=0.01)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    time.sleep(0.02)
+    assert cache.get("key") is None
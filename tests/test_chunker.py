@@ -0,0 +1,56 @@
+# Test cases for chunker.py
+import types
+
+from app.chunker import Chunker
+
+
+def test_chunker_keeps_code_blocks_and_sentences_whole():
+    text = (
+        "Intro sentence one. Intro sentence two.\n\n"
+        "```python\ndef add(a, b):\n    return a + b\n```\n\n"
+        "First long sentence about lists and dicts. Second long sentence about sets and tuples."
+    )
+    chunker = Chunker(max_tokens=10, overlap_tokens=0)
+
+    chunks = list(chunker.chunks(text))
+
+    assert "```python\ndef add(a, b):\n    return a + b\n```" in chunks
+    assert "First long sentence about lists and dicts." in chunks
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+
+
+def test_chunker_overlaps_and_is_lazy():
+    text = " ".join(f"Sentence {i} here." for i in range(10))
+    chunker = Chunker(max_tokens=9, overlap_tokens=3)
+
+    chunks = chunker.chunks(text)
+
+    assert isinstance(chunks, types.GeneratorType)
+    first, second = next(chunks), next(chunks)
+    assert first == "Sentence 0 here. Sentence 1 here. Sentence 2 here."
+    assert second.startswith("Sentence 2 here.")
+
+
+def test_chunker_splits_oversized_sentences_on_words():
+    chunker = Chunker(count_tokens=len, max_tokens=12, overlap_tokens=0)
+
+    chunks = list(chunker.chunks("aaaa bbbb cccc dddd eeee"))
+
+    assert chunks == ["aaaa bbbb cccc", "dddd eeee"]
+
+
+def test_chunker_never_counts_an_oversized_block_whole():
+    counted = []
+
+    def count_tokens(text):
+        counted.append(len(text))
+        return len(text.split())
+
+    # صفحة ويب مسطحة في سطر واحد
+    text = " ".join(f"Sentence number {i} is here." for i in range(2000))
+    chunker = Chunker(count_tokens=count_tokens, max_tokens=50, overlap_tokens=0)
+
+    chunks = list(chunker.chunks(text))
+
+    assert len(chunks) == 200
+    assert max(counted) < 100
@@ -2,3 +2,45 @@
 
 def test_code_generator_init():
     assert True
+
+
+def test_llm_client_retries_against_stub_server():
+    import asyncio
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    from app.llm_client import AsyncLLMClient
+
+    calls = []
+
+    async def completions(request):
+        calls.append(await request.json())
+        if len(calls) == 1:
+            return web.json_response({"error": "busy"}, status=503)
+        return web.json_response({"choices": [{"message": {"content": "print('ok')"}}]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", completions)
+        async with TestServer(app) as server:
+            client = AsyncLLMClient("test-key", base_url=str(server.make_url("/v1")),
+                                    max_retries=2, backoff_base=0.01)
+            try:
+                return await client.chat([{"role": "user", "content": "hi"}], model="stub")
+            finally:
+                await client.close()
+
+    assert asyncio.run(run()) == "print('ok')"
+    assert len(calls) == 2
+    assert calls[0]["model"] == "stub"
+
+
+def test_fence_stripper_matches_clean_code_for_streamed_tokens():
+    from app.code_generator import FenceStripper
+
+    tokens = ["``", "`pyt", "hon\nde", "f f():\n", "    return 1\n", "``", "`"]
+    stripper = FenceStripper()
+    streamed = "".join(stripper.feed(token) for token in tokens) + stripper.finish()
+
+    assert streamed == "def f():\n    return 1"
@@ -0,0 +1,32 @@
+# Test cases for disk_cache.py
+import asyncio
+
+from app.disk_cache import DiskCache
+
+
+def test_disk_cache_roundtrip_and_expiry(tmp_path):
+    cache = DiskCache(tmp_path / "cache", default_ttl=60)
+
+    async def run():
+        await cache.set("fresh", {"text": "hello"}, meta={"etag": "abc"})
+        await cache.set("stale", "old", ttl=0)
+        return await cache.get("fresh"), await cache.get("stale"), await cache.get_entry("stale")
+
+    fresh, stale, stale_entry = asyncio.run(run())
+
+    assert fresh == {"text": "hello"}
+    assert stale is None
+    assert stale_entry["value"] == "old"
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=600)
+
+    async def run():
+        await cache.set("a", "x" * 200)
+        await cache.set("b", "y" * 200)
+        await cache.get("a")
+        await cache.set("c", "z" * 200)
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [True, False, True]
@@ -0,0 +1,98 @@
+# Test cases for embeddings.py
+import asyncio
+
+import numpy as np
+
+from app.embeddings import EmbeddingService, OnnxBackend
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts])
+
+
+def test_encode_documents_single_call():
+    model = FakeModel()
+    service = EmbeddingService(model)
+    try:
+        results = asyncio.run(service.encode_documents([["a", "bb"], ["ccc"]]))
+    finally:
+        service.close()
+
+    assert len(model.calls) == 1
+    assert [r.shape[0] for r in results] == [2, 1]
+    assert results[1][0][0] == 3
+
+
+class FakeSession:
+    def run(self, outputs, feed):
+        # كل رمز يحمل قيمة معرّفه في البعد الأول و 1 في الثاني
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def fake_tokenizer(texts, **kwargs):
+    width = max(len(text.split()) for text in texts)
+    ids = [[len(word) for word in text.split()] + [0] * (width - len(text.split())) for text in texts]
+    mask = [[1] * len(text.split()) + [0] * (width - len(text.split())) for text in texts]
+    return {"input_ids": np.array(ids), "attention_mask": np.array(mask), "unused": np.array(ids)}
+
+
+def test_onnx_backend_mean_pools_unpadded_tokens_in_input_order():
+    backend = OnnxBackend.__new__(OnnxBackend)
+    backend.session = FakeSession()
+    backend.tokenizer = fake_tokenizer
+    backend.input_names = {"input_ids", "attention_mask"}
+    backend.config = {"dimension": 2, "max_seq_length": 128, "normalize": False}
+
+    embeddings = backend.encode(["aaaa bb", "a", "ccc ccc ccc"], batch_size=2)
+
+    assert embeddings.tolist() == [[3.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+
+    backend.config["normalize"] = True
+    assert np.allclose(np.linalg.norm(backend.encode(["aaaa bb"]), axis=1), 1.0)
+
+
+def _tiny_sentence_transformer(directory):
+    """نموذج BERT صغير بأوزان عشوائية يُبنى محلياً حتى لا يحتاج الاختبار إلى الشبكة"""
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = "python lists support append def add a b return".split()
+    vocab = directory / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ":", "(", ")", ",", ".", "+"] + words))
+    BertTokenizerFast(vocab_file=str(vocab)).save_pretrained(str(directory / "bert"))
+    config = BertConfig(vocab_size=len(words) + 11, hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64)
+    BertModel(config).save_pretrained(str(directory / "bert"))
+
+    transformer = models.Transformer(str(directory / "bert"), max_seq_length=64)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+    model = SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu")
+    model.save(str(directory / "model"))
+    return str(directory / "model")
+
+
+def test_onnx_export_matches_pytorch(tmp_path):
+    import pytest
+
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    pytest.importorskip("sentence_transformers")
+    from app.embeddings import SentenceTransformerBackend, export_onnx
+
+    model_name = _tiny_sentence_transformer(tmp_path)
+    export_onnx(model_name, tmp_path / "onnx")
+
+    texts = ["Python lists support append.", "def add(a, b):\n    return a + b", "a"]
+    expected = SentenceTransformerBackend(model_name).encode(texts)
+    for quantize, threshold in ((False, 0.999), (True, 0.9)):
+        backend = OnnxBackend(tmp_path / "onnx", quantize=quantize)
+        assert backend.model_file.name == ("model.int8.onnx" if quantize else "model.onnx")
+        embeddings = backend.encode(texts, batch_size=2)
+        assert embeddings.shape == expected.shape
+        assert ((embeddings * expected).sum(axis=1) > threshold).all()
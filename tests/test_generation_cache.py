@@ -0,0 +1,42 @@
+# Test cases for generation_cache.py
+import asyncio
+
+from app.generation_cache import GenerationCache
+
+
+def test_exact_and_semantic_hits(tmp_path):
+    vectors = {"sort a list": [1.0, 0.0], "sort the list": [0.99, 0.05], "parse json": [0.0, 1.0]}
+
+    async def embed(text):
+        return vectors.get(text)
+
+    cache = GenerationCache(tmp_path, embed=embed, similarity_threshold=0.95)
+
+    async def run():
+        await cache.set("Sort a list.", "python", None, "sorted(items)")
+        return (
+            await cache.get("sort  a LIST", "python"),
+            await cache.get("sort the list", "python"),
+            await cache.get("parse json", "python"),
+            await cache.get("sort a list", "javascript"),
+        )
+
+    assert asyncio.run(run()) == ("sorted(items)", "sorted(items)", None, None)
+    assert cache.counters == {"exact_hits": 1, "semantic_hits": 1, "misses": 2, "stores": 1}
+
+
+def test_semantic_entry_dropped_when_disk_entry_is_gone(tmp_path):
+    async def embed(text):
+        return [1.0, 0.0]
+
+    cache = GenerationCache(tmp_path, embed=embed, similarity_threshold=0.9)
+
+    async def run():
+        await cache.set("sort a list", "python", None, "sorted(items)")
+        await cache.get("sort the list", "python")
+        for path in tmp_path.glob("*.json"):
+            path.unlink()
+        return await cache.get("sort the list", "python")
+
+    assert asyncio.run(run()) is None
+    assert cache._semantic_index[("python", cache.context_hash(None))] == []
@@ -0,0 +1,50 @@
+# Test cases for html_extract.py
+from app.chunker import Chunker
+from app.html_extract import html_to_text
+
+
+def test_html_to_text_strips_unwanted_elements():
+    html = """<html><head><style>body {}</style></head><body>
+    <nav>Menu</nav><h1>Title</h1><script>var x = 1;</script>
+    <p>First  paragraph</p><footer>Footer</footer></body></html>"""
+
+    assert html_to_text(html) == "Title\n\nFirst paragraph"
+
+
+def test_html_to_text_enforces_max_size():
+    html = "<p>" + "a" * 100 + "</p>"
+
+    assert len(html_to_text(html, max_chars=50)) <= 50
+
+
+def test_html_to_text_handles_encoding_declaration():
+    html = '<?xml version="1.0" encoding="utf-8"?><html><body><p>Hi</p></body></html>'
+
+    assert html_to_text(html) == "Hi"
+
+
+PAGE = """<html><body>
+<h2>Reading files</h2>
+<p>Open the file with a context manager so it is always closed.
+It works for text and binary modes.</p>
+<pre><code class="language-python">with open(path) as f:
+    data = f.read()
+</code></pre>
+<p>Call <code>f.read()</code> only for small files.</p>
+</body></html>"""
+
+
+def test_html_to_text_keeps_paragraphs_and_fences_code():
+    assert html_to_text(PAGE) == (
+        "Reading files\n\n"
+        "Open the file with a context manager so it is always closed. It works for text and binary modes.\n\n"
+        "```python\nwith open(path) as f:\n    data = f.read()\n```\n\n"
+        "Call f.read() only for small files."
+    )
+
+
+def test_html_page_chunks_on_paragraph_and_code_boundaries():
+    chunks = list(Chunker(max_tokens=12, overlap_tokens=0).chunks(html_to_text(PAGE)))
+
+    assert "```python\nwith open(path) as f:\n    data = f.read()\n```" in chunks
+    assert chunks[-1] == "Call f.read() only for small files."
@@ -0,0 +1,88 @@
+# Test cases for job_queue.py
+import os
+import time
+import asyncio
+
+from app.job_queue import JobQueue
+from app.persistence import read_json, write_json
+
+
+def test_jobs_run_by_priority_and_persist(tmp_path):
+    order = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(job, progress):
+            if job["payload"]["name"] == "blocker":
+                await release.wait()
+            progress.source("http://example.com", "fetched")
+            progress.chunks("http://example.com", 3, 3)
+            order.append(job["payload"]["name"])
+            return {"name": job["payload"]["name"]}
+
+        queue = JobQueue(tmp_path, workers=1)
+        await queue.start(handler)
+        blocker = await queue.submit({"name": "blocker"})
+        low = await queue.submit({"name": "low"}, priority=-1)
+        high = await queue.submit({"name": "high"}, priority=5)
+        release.set()
+        await queue._queue.join()
+        await queue.close()
+
+        restarted = JobQueue(tmp_path)
+        return [await restarted.get(job["job_id"]) for job in (blocker, low, high)]
+
+    jobs = asyncio.run(run())
+
+    assert order == ["blocker", "high", "low"]
+    assert [job["status"] for job in jobs] == ["completed"] * 3
+    assert jobs[2]["result"] == {"name": "high"}
+    assert jobs[0]["progress"]["chunks_done"] == 3
+
+
+def test_progress_is_persisted_while_job_runs(tmp_path):
+    async def run():
+        release = asyncio.Event()
+        flushed = {}
+
+        async def handler(job, progress):
+            progress.source("http://example.com", "fetched")
+            progress.chunks("http://example.com", 2, 5)
+            await asyncio.sleep(0.1)
+            # حالة الملف كما ستُقرأ بعد انهيار العملية في هذه اللحظة
+            flushed.update(read_json(tmp_path / f"{job['job_id']}.json"))
+            await release.wait()
+
+        queue = JobQueue(tmp_path, workers=1, progress_interval=0.01)
+        await queue.start(handler)
+        await queue.submit({"name": "slow"})
+        while not flushed:
+            await asyncio.sleep(0.01)
+        release.set()
+        await queue._queue.join()
+        await queue.close()
+        return flushed
+
+    flushed = asyncio.run(run())
+
+    assert flushed["status"] == "running"
+    assert flushed["progress"]["chunks_done"] == 2
+    assert flushed["progress"]["sources"]["http://example.com"]["status"] == "fetched"
+
+
+def test_finished_job_files_are_pruned(tmp_path):
+    now = time.time()
+    for index, name in enumerate(["old", "a", "b", "c"]):
+        write_json(tmp_path / f"{name}.json", {"job_id": name, "status": "completed"})
+        age = 30 * 86400 if name == "old" else index
+        os.utime(tmp_path / f"{name}.json", (now - age, now - age))
+
+    async def run():
+        queue = JobQueue(tmp_path, retention_days=7, max_kept=2)
+        await queue.start(lambda job, progress: None)
+        await queue.close()
+
+    asyncio.run(run())
+
+    assert sorted(path.stem for path in tmp_path.glob("*.json")) == ["a", "b"]
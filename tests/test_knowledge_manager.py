@@ -0,0 +1,163 @@
+# Test cases for knowledge_manager.py
+import os
+import json
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.chunker import Chunker
+from app.embeddings import EmbeddingService
+from app.knowledge_manager import KnowledgeManager, detect_language
+from app.lexical_index import LexicalIndex
+from app.registry import registry
+from app.vector_index import NumpyVectorIndex
+
+
+class FakeBackend:
+    tokenizer = None
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0, 0.5] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    backend = FakeBackend()
+    embedder = EmbeddingService(backend)
+    monkeypatch.setattr(registry, "embedding_model", backend)
+    monkeypatch.setattr(registry, "embedder", embedder)
+    monkeypatch.setattr(registry, "vector_index", NumpyVectorIndex(tmp_path / "vector_index", ivf_lists=0))
+    monkeypatch.setattr(registry, "lexical_index", LexicalIndex(tmp_path / "lexical_index"))
+    monkeypatch.setattr(registry, "ready", True)
+    monkeypatch.setattr(registry, "knowledge_path", tmp_path.resolve())
+    yield KnowledgeManager(str(tmp_path))
+    embedder.close()
+
+
+def _embedded_texts(manager):
+    return [text for call in manager.embedding_model.calls for text in call]
+
+
+def _write_base(manager, topic, knowledge):
+    base = manager.knowledge_path / "base"
+    base.mkdir(exist_ok=True)
+    path = base / f"{topic}.json"
+    path.write_text(json.dumps(knowledge))
+    return path
+
+
+def test_base_topic_skipped_by_size_mtime_then_sha256(manager):
+    path = _write_base(manager, "algorithms", {"chunks": ["Binary search halves the range."]})
+
+    fingerprint, knowledge = manager._read_base_topic("algorithms", None)
+    assert knowledge["chunks"] == ["Binary search halves the range."]
+
+    # نفس الحجم ووقت التعديل: لا قراءة للملف
+    assert manager._read_base_topic("algorithms", fingerprint) == (fingerprint, None)
+
+    # وقت تعديل جديد بنفس المحتوى: البصمة تتحدث والموضوع يبقى متخطى
+    os.utime(path, ns=(fingerprint["mtime_ns"] + 10**9, fingerprint["mtime_ns"] + 10**9))
+    touched, knowledge = manager._read_base_topic("algorithms", fingerprint)
+    assert knowledge is None
+    assert touched["sha256"] == fingerprint["sha256"] and touched["mtime_ns"] != fingerprint["mtime_ns"]
+
+    path.write_text(json.dumps({"chunks": ["Quick sort partitions around a pivot."]}))
+    _, knowledge = manager._read_base_topic("algorithms", touched)
+    assert knowledge["chunks"] == ["Quick sort partitions around a pivot."]
+
+
+def test_load_base_knowledge_indexes_pre_embedded_chunks(manager):
+    _write_base(manager, "python_programming", {"chunks": [
+        {"content": "Lists are mutable sequences.", "embedding": [0.0, 1.0, 0.0]},
+        {"content": "Tuples are immutable.", "embedding": [1.0, 0.0]},
+        "Dicts map keys to values."
+    ]})
+
+    asyncio.run(manager.load_base_knowledge())
+
+    assert manager.vector_index.count() == 3
+    assert manager.lexical_index.count() == 3
+    # المتجه المحفوظ بنفس البعد يُستخدم كما هو، وذو البعد المختلف يُعاد تضمينه
+    embedded = _embedded_texts(manager)
+    assert "Lists are mutable sequences." not in embedded
+    assert {"Tuples are immutable.", "Dicts map keys to values."} <= set(embedded)
+    assert manager.vector_index.query([0.0, 1.0, 0.0], 1)[0]["content"] == "Lists are mutable sequences."
+
+    # التشغيل التالي يتخطى الموضوع غير المتغير
+    calls = len(manager.embedding_model.calls)
+    asyncio.run(manager.load_base_knowledge())
+    assert len(manager.embedding_model.calls) == calls
+    assert manager.vector_index.count() == 3
+
+
+def test_process_content_skips_duplicate_chunks(manager, monkeypatch):
+    manager.chunker = Chunker(max_tokens=8, overlap_tokens=0)
+    upserted = []
+    upsert = manager.vector_index.upsert
+
+    def record_upsert(ids, **kwargs):
+        upserted.extend(ids)
+        upsert(ids=ids, **kwargs)
+
+    monkeypatch.setattr(manager.vector_index, "upsert", record_upsert)
+    content = "Alpha beta gamma.\n\nDelta epsilon zeta eta theta iota kappa.\n\nAlpha beta gamma."
+
+    # التكرار داخل المستند نفسه يُضمّن مرة واحدة
+    first = asyncio.run(manager.process_content("python", content, "https://a.example"))
+    assert _embedded_texts(manager) == ["Alpha beta gamma.", "Delta epsilon zeta eta theta iota kappa."]
+    assert len(upserted) == 2 and len(first["chunks"]) == 2
+    assert first["skipped_chunks"] == 1
+
+    # الأجزاء الموجودة مسبقاً في الفهرس لا تُضمّن ولا تُضاف مجدداً
+    second = asyncio.run(manager.process_content("python", content, "https://b.example"))
+    assert len(_embedded_texts(manager)) == 2
+    assert len(upserted) == 2
+    assert second["chunks"] == [] and second["skipped_chunks"] == 3
+    assert manager.vector_index.count() == 2
+
+
+MIXED_CHUNK = (
+    "Use pandas.read_csv to load a CSV file into a DataFrame before cleaning it.\n\n"
+    "```js\nfetch(url)\n```"
+)
+
+
+def test_detect_language_prefers_topic_over_short_fenced_snippet():
+    assert detect_language("python_programming", MIXED_CHUNK) == "python"
+    assert detect_language("algorithms", MIXED_CHUNK) == "general"
+    # جزء من الكود فقط يُصنف بوسمه
+    assert detect_language("python_programming", "```js\nconst x = [1, 2].map(n => n * 2)\n```") == "javascript"
+
+
+def test_mixed_fence_chunk_is_found_by_python_queries(manager):
+    asyncio.run(manager.process_content("python_programming", MIXED_CHUNK, "https://a.example"))
+
+    lexical = asyncio.run(manager.find_relevant_knowledge("pandas.read_csv", "python"))
+    assert [r["content"] for r in lexical] == [MIXED_CHUNK]
+    dense = asyncio.run(manager.find_relevant_knowledge("load a csv file", "python"))
+    assert [r["content"] for r in dense] == [MIXED_CHUNK]
+
+
+def test_base_chunks_already_indexed_drop_stale_embeddings(manager):
+    asyncio.run(manager.load_base_knowledge())
+    asyncio.run(manager.process_content("algorithms", "Binary search halves the range.", "https://a.example"))
+    # نفس الجزء في ملف أساسي بمتجه من نموذج سابق ببعد مختلف، بجانب جزء جديد
+    _write_base(manager, "algorithms", {"chunks": [
+        {"content": "Binary search halves the range.", "embedding": [0.1, 0.2, 0.3, 0.4]},
+        "Merge sort splits and merges."
+    ]})
+
+    asyncio.run(manager.load_base_knowledge())
+
+    saved = asyncio.run(manager.load_topic("algorithms"))
+    assert {chunk["content"] for chunk in saved["chunks"]} == {
+        "Binary search halves the range.", "Merge sort splits and merges."
+    }
+    ids, matrix = manager.topic_store.load_embeddings("algorithms")
+    assert matrix.shape[1] == 3
+    assert manager.vector_index.count() == 2
@@ -0,0 +1,58 @@
+# Test cases for lexical_index.py
+from app.lexical_index import LexicalIndex, is_identifier_query, tokenize
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    tokens = tokenize("Call pandas.read_csv or getElementById")
+
+    assert "pandas.read_csv" in tokens
+    assert {"pandas", "read_csv", "read", "csv"} <= set(tokens)
+    assert {"getelementbyid", "get", "element", "by", "id"} <= set(tokens)
+
+
+def test_is_identifier_query():
+    assert is_identifier_query("pandas.read_csv")
+    assert is_identifier_query("getElementById")
+    assert is_identifier_query("KeyError")
+    assert not is_identifier_query("how to sort a list")
+    assert not is_identifier_query("sorting")
+
+
+def test_lexical_index_ranks_with_bm25_and_persists(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.upsert(
+        ["csv", "json", "lists"],
+        [
+            "Use pandas.read_csv to load a CSV file into a DataFrame.",
+            "Use json.loads to parse a JSON string.",
+            "Python lists support append and pop."
+        ],
+        [{"language": "python"}, {"language": "python"}, {"language": "general"}]
+    )
+
+    assert [r["id"] for r in index.search("read_csv", 5)] == ["csv"]
+    assert index.search("append", 5, where={"language": "python"}) == []
+
+    # إعادة فهرسة جزء موجود تستبدل مصطلحاته القديمة
+    index.upsert(["json"], ["Use json.dumps to serialize."], [{"language": "python"}])
+    assert index.search("loads", 5) == []
+
+    reloaded = LexicalIndex(tmp_path)
+    assert reloaded.count() == 3
+    assert [r["id"] for r in reloaded.search("json.dumps", 5)] == ["json"]
+
+
+def test_lexical_index_compacts_replaced_records(tmp_path):
+    index = LexicalIndex(tmp_path, compact_ratio=2)
+    index.upsert(["a", "b"], ["alpha one", "beta one"], [{}, {}])
+    for word in ("red", "green", "blue"):
+        index.upsert(["a"], [f"alpha {word}"], [{}])
+
+    # خمسة سطور لجزأين تتجاوز النسبة فيُعاد كتابة السجل بسطر لكل جزء
+    assert not (tmp_path / "records.jsonl").exists()
+    assert sum(1 for _ in open(next(tmp_path.glob("records.*.jsonl")))) == 2
+
+    reloaded = LexicalIndex(tmp_path)
+    assert reloaded.count() == 2
+    assert [r["id"] for r in reloaded.search("blue", 5)] == ["a"]
+    assert reloaded.search("red", 5) == []
@@ -0,0 +1,60 @@
+# Test cases for main.py
+import json
+import types
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.ai_core import AICore
+from app.main import app
+from app.web_research import WebResearcher
+
+
+def _fake_researcher(monkeypatch):
+    researcher = WebResearcher()
+    # جلسة وهمية حتى لا يُنشئ extract_many جلسة حقيقية
+    researcher.session = object()
+
+    async def search(query, max_results=5, focus_on=None):
+        return [
+            {"url": "https://a.example", "title": "A"},
+            {"url": "https://b.example", "title": "B"},
+            {"url": "https://a.example", "title": "A again"}
+        ]
+
+    async def extract_content(url):
+        return f"content of {url}"
+
+    monkeypatch.setattr(researcher, "search", search)
+    monkeypatch.setattr(researcher, "extract_content", extract_content)
+    return researcher
+
+
+def test_research_stream_frame_order(monkeypatch):
+    researcher = _fake_researcher(monkeypatch)
+    monkeypatch.setattr(app.state, "ai_core", types.SimpleNamespace(web_researcher=researcher), raising=False)
+
+    response = TestClient(app).post("/research/stream", json={"query": "python lists"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert [frame["type"] for frame in frames] == ["result"] * 3 + ["content"] * 2 + ["summary"]
+    assert {frame["url"] for frame in frames if frame["type"] == "content"} == {"https://a.example", "https://b.example"}
+    assert frames[-1]["sources_count"] == 3
+    assert len(frames[-1]["key_insights"]) == 2
+
+
+def test_research_stream_summary_matches_research(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_PATH", str(tmp_path))
+    ai = AICore()
+    ai.web_researcher = _fake_researcher(monkeypatch)
+    monkeypatch.setattr(app.state, "ai_core", ai, raising=False)
+
+    research = asyncio.run(ai._research("python lists"))
+    response = TestClient(app).post("/research/stream", json={"query": "python lists"})
+    summary = [json.loads(line) for line in response.text.splitlines()][-1]
+
+    # ترتيب اكتمال الصفحات غير محدد، لذا نقارن المحتوى دون الترتيب
+    assert sorted(summary["key_insights"]) == sorted(research["key_insights"])
+    assert summary["sources_count"] == research["sources_count"] == 3
+    assert all(result["content"] == "content of " + result["url"] for result in research["results"])
@@ -0,0 +1,57 @@
+# Test cases for persistence.py
+import asyncio
+
+import pytest
+
+from app.persistence import KeyedLocks, append_log, atomic_write, read_json_async, read_log, write_json_async
+
+
+def test_json_roundtrip_is_atomic(tmp_path):
+    path = tmp_path / "nested" / "data.json"
+
+    async def run():
+        await write_json_async(path, {"topic": "بايثون", "items": [1, 2]})
+        return await read_json_async(path)
+
+    assert asyncio.run(run()) == {"topic": "بايثون", "items": [1, 2]}
+
+    class Broken:
+        def __iter__(self):
+            raise RuntimeError("boom")
+
+    with pytest.raises(TypeError):
+        atomic_write(path, Broken())
+    # الملف الأصلي سليم ولا تبقى ملفات مؤقتة
+    assert asyncio.run(read_json_async(path))["items"] == [1, 2]
+    assert [p.name for p in path.parent.iterdir()] == ["data.json"]
+
+
+def test_keyed_locks_serialize_same_key_only():
+    locks = KeyedLocks()
+    events = []
+
+    async def save(key, name):
+        async with locks.lock(key):
+            events.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end {name}")
+
+    async def run():
+        await asyncio.gather(save("a", "a1"), save("a", "a2"), save("b", "b1"))
+
+    asyncio.run(run())
+
+    assert events.index("end a1") < events.index("start a2")
+    assert events.index("start b1") < events.index("end a1")
+    assert not locks._locks
+
+
+def test_append_log_drops_uncommitted_tail(tmp_path):
+    path = tmp_path / "log.jsonl"
+    committed = append_log(path, 0, b"one\n")
+    # كتابة لم يُثبت طولها في البيان (انهيار قبل تحديثه)
+    append_log(path, committed, b"partial")
+
+    committed = append_log(path, committed, b"two\n")
+
+    assert read_log(path, committed) == b"one\ntwo\n"
@@ -0,0 +1,31 @@
+# Test cases for prompt_builder.py
+from app.prompt_builder import PromptBuilder
+
+
+def test_knowledge_sorted_deduped_and_budgeted():
+    builder = PromptBuilder("gpt-4", context_window=8192, knowledge_budget=200, max_output_tokens=2000)
+    shared = "use context managers to close files and release locks reliably in python code"
+    knowledge = [
+        {"content": "low similarity snippet about loops", "similarity": 0.2},
+        {"content": shared, "similarity": 0.9},
+        {"content": shared + " always", "similarity": 0.8},
+        {"content": "x" * 5000, "similarity": 0.5},
+    ]
+
+    messages, max_tokens = builder.build("system", "task\n\n", knowledge)
+    user = messages[1]["content"]
+
+    assert user.index(shared) < user.index("xxx")
+    assert shared + " always" not in user
+    assert "low similarity" not in user
+    assert builder.count_messages(messages) + max_tokens <= builder.context_window
+    assert max_tokens == 2000
+
+
+def test_max_tokens_shrinks_to_fit_window():
+    builder = PromptBuilder("gpt-4", context_window=1000, knowledge_budget=5000, max_output_tokens=2000)
+
+    messages, max_tokens = builder.build("system", "task\n\n", [{"content": "y" * 20000, "similarity": 1.0}])
+
+    assert max_tokens >= builder.min_output_tokens
+    assert builder.count_messages(messages) + max_tokens <= 1000
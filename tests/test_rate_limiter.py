@@ -0,0 +1,53 @@
+# Test cases for rate_limiter.py
+import asyncio
+
+from app.rate_limiter import HostRateLimiter
+
+
+def test_burst_then_wait_per_host():
+    limiter = HostRateLimiter(default_rate=20, default_burst=2)
+
+    async def run():
+        return [await limiter.acquire("https://a.example/page") for _ in range(3)]
+
+    waits = asyncio.run(run())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] > 0
+
+
+def test_hosts_do_not_throttle_each_other():
+    limiter = HostRateLimiter(default_rate=1, default_burst=1)
+
+    async def run():
+        return await asyncio.gather(
+            limiter.acquire("https://a.example/"),
+            limiter.acquire("https://b.example/"),
+        )
+
+    assert asyncio.run(run()) == [0.0, 0.0]
+    assert set(limiter.stats()) == {"a.example", "b.example"}
+
+
+def test_parse_overrides():
+    overrides = HostRateLimiter.parse_overrides("api.example.com=0.5:2, bad, other.org=3")
+
+    assert overrides == {"api.example.com": (0.5, 2), "other.org": (3.0, 1)}
+
+
+def test_wait_includes_time_queued_behind_other_requests():
+    limiter = HostRateLimiter(default_rate=10, default_burst=1)
+
+    async def run():
+        return await asyncio.gather(*(limiter.acquire("https://a.example/") for _ in range(5)))
+
+    waits = asyncio.run(run())
+
+    assert waits[0] == 0.0
+    assert waits[-1] >= 0.35
+
+
+def test_parse_overrides_rejects_non_positive_limits():
+    overrides = HostRateLimiter.parse_overrides("a.example=0:2,b.example=1:0,c.example=-1,d.example=0.5:3")
+
+    assert overrides == {"d.example": (0.5, 3)}
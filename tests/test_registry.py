@@ -0,0 +1,107 @@
+# Test cases for registry.py
+import asyncio
+import types
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import registry as registry_module
+from app.ai_core import AICore
+from app.knowledge_manager import KnowledgeManager
+from app.main import app
+from app.registry import ModelRegistry
+
+
+class FakeBackend:
+    tokenizer = None
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+    def stats(self):
+        return {"backend": "fake"}
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    created = []
+
+    def create_backend(model_name):
+        created.append(FakeBackend())
+        return created[-1]
+
+    monkeypatch.setattr(registry_module, "create_embedding_backend", create_backend)
+    return created
+
+
+def test_registry_loads_lazily_once_and_is_bound_to_one_path(tmp_path, loads):
+    registry = ModelRegistry()
+    assert not registry.ready and loads == []
+
+    async def run():
+        await asyncio.gather(registry.get(tmp_path), registry.get(tmp_path))
+        try:
+            with pytest.raises(ValueError):
+                await registry.get(tmp_path / "other")
+        finally:
+            await registry.close()
+
+    asyncio.run(run())
+    assert len(loads) == 1
+
+
+def test_registry_warmup_loads_and_encodes_in_background(tmp_path, loads):
+    registry = ModelRegistry()
+
+    async def run():
+        task = registry.start_warmup(tmp_path)
+        assert registry.status()["warming_up"]
+        await task
+        status = registry.status()
+        await registry.close()
+        return status
+
+    status = asyncio.run(run())
+    assert status["ready"] and not status["warming_up"]
+    assert status["embedding"] == {"backend": "fake"}
+    assert loads[0].calls == [["warmup"]]
+
+
+def test_base_knowledge_waits_for_first_use_when_warmup_is_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_PATH", str(tmp_path))
+    ai = AICore()
+    ready = asyncio.Event()
+    loaded = []
+
+    async def load_base_knowledge():
+        loaded.append(True)
+
+    ai.knowledge_manager = types.SimpleNamespace(wait_ready=ready.wait, load_base_knowledge=load_base_knowledge)
+
+    async def run():
+        task = asyncio.create_task(ai._load_base_knowledge(lazy=True))
+        await asyncio.sleep(0.01)
+        before = list(loaded)
+        ready.set()
+        await task
+        return before
+
+    assert asyncio.run(run()) == []
+    assert loaded == [True]
+
+
+def test_health_reports_knowledge_ready(tmp_path, monkeypatch):
+    monkeypatch.setattr(app.state, "knowledge_manager", KnowledgeManager(str(tmp_path)), raising=False)
+    monkeypatch.setattr(app.state, "ai_core", None, raising=False)
+    client = TestClient(app)
+
+    monkeypatch.setattr(registry_module.registry, "ready", False)
+    assert client.get("/health").json()["knowledge_ready"] is False
+
+    monkeypatch.setattr(registry_module.registry, "ready", True)
+    assert client.get("/health").json()["knowledge_ready"] is True
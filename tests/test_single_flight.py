@@ -0,0 +1,40 @@
+# Test cases for single_flight.py
+import asyncio
+
+from app.single_flight import SingleFlight, TooManyWaiters
+
+
+def test_identical_calls_share_one_execution():
+    calls = []
+
+    async def work(topic):
+        calls.append(topic)
+        await asyncio.sleep(0.01)
+        return {"topic": topic}
+
+    flight = SingleFlight(lambda topic: topic.lower())
+
+    async def run():
+        return await asyncio.gather(*(flight.do(work, t) for t in ["Python", "python", "rust"]))
+
+    results = asyncio.run(run())
+
+    assert calls == ["Python", "rust"]
+    assert results[0] is results[1]
+    assert flight.stats() == {"executions": 2, "coalesced": 1, "rejected": 0, "in_flight": 0}
+
+
+def test_waiters_are_bounded():
+    async def work(key):
+        await asyncio.sleep(0.01)
+        return key
+
+    flight = SingleFlight(lambda key: key, max_waiters=1)
+
+    async def run():
+        return await asyncio.gather(*(flight.do(work, "k") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert results[:2] == ["k", "k"]
+    assert isinstance(results[2], TooManyWaiters)
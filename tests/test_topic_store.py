@@ -0,0 +1,67 @@
+# Test cases for topic_store.py
+import json
+
+import numpy as np
+
+from app.topic_store import TopicStore
+
+
+def _knowledge(chunk_ids, key_points):
+    return {
+        "topic": "python",
+        "key_points": key_points,
+        "chunks": [
+            {"id": chunk_id, "content": f"text {chunk_id}", "embedding": [float(i), 1.0, 2.0]}
+            for i, chunk_id in enumerate(chunk_ids)
+        ]
+    }
+
+
+def test_topic_store_appends_and_merges(tmp_path):
+    store = TopicStore(tmp_path, compact_after=100)
+    store.append("python", _knowledge(["a", "b"], ["first"]), ["https://a.example"])
+    store.append("python", _knowledge(["c"], ["first", "second"]), ["https://b.example"])
+
+    knowledge = store.load("python")
+    assert [chunk["id"] for chunk in knowledge["chunks"]] == ["a", "b", "c"]
+    assert knowledge["key_points"] == ["first", "second"]
+    assert knowledge["sources"] == ["https://a.example", "https://b.example"]
+    assert all("embedding" not in chunk for chunk in knowledge["chunks"])
+
+    ids, matrix = store.load_embeddings("python")
+    assert ids == ["a", "b", "c"]
+    assert isinstance(matrix, np.memmap)
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix[2], [0.0, 1.0, 2.0])
+
+
+def test_topic_store_compaction_drops_replaced_rows(tmp_path):
+    store = TopicStore(tmp_path, compact_after=3)
+    store.append("python", _knowledge(["a", "b"], ["first"]), [])
+    store.append("python", _knowledge(["b"], ["second"]), [])
+    store.append("python", _knowledge(["c"], []), [])
+
+    manifest = json.loads((tmp_path / "python" / "manifest.json").read_text())
+    assert manifest["generation"] == 1
+    assert manifest["records"] == 1
+    assert sorted(p.name for p in (tmp_path / "python").iterdir()) == [
+        "embeddings.1.f32", "log.1.jsonl", "manifest.json"
+    ]
+
+    ids, matrix = store.load_embeddings("python")
+    assert ids == ["a", "b", "c"]
+    np.testing.assert_allclose(matrix[:, 0], [0.0, 0.0, 0.0])
+    assert store.load("python")["key_points"] == ["first", "second"]
+
+
+def test_topic_store_migrates_legacy_json(tmp_path):
+    topic_dir = tmp_path / "python"
+    topic_dir.mkdir()
+    (topic_dir / "knowledge.json").write_text(json.dumps(_knowledge(["a"], ["legacy"])))
+    (topic_dir / "sources.json").write_text(json.dumps({"sources": ["base_knowledge"]}))
+
+    knowledge = TopicStore(tmp_path).load("python")
+
+    assert knowledge["key_points"] == ["legacy"]
+    assert knowledge["sources"] == ["base_knowledge"]
+    assert not (topic_dir / "knowledge.json").exists()
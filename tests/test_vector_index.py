@@ -0,0 +1,91 @@
+# Test cases for vector_index.py
+import numpy as np
+
+from app.vector_index import NumpyVectorIndex
+
+
+def _index(path, **kwargs):
+    return NumpyVectorIndex(path, **kwargs)
+
+
+def test_numpy_index_upsert_query_and_reload(tmp_path):
+    index = _index(tmp_path, ivf_lists=0)
+    index.upsert(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+        documents=["doc a", "doc b", "doc c"],
+        metadatas=[{"topic": "x"}, {"topic": "y"}, {"topic": "z"}]
+    )
+    # استبدال جزء موجود لا يضيف صفاً جديداً
+    index.upsert(ids=["b"], embeddings=[[-1.0, 0.0]], documents=["doc b2"], metadatas=[{"topic": "y"}])
+
+    results = index.query([1.0, 0.1], n_results=2)
+    assert [r["id"] for r in results] == ["a", "c"]
+    assert abs(results[0]["similarity"] - 0.995) < 0.001
+    assert index.existing_ids(["a", "missing"]) == {"a"}
+
+    reloaded = _index(tmp_path, ivf_lists=0)
+    assert reloaded.count() == 3
+    last = reloaded.query([1.0, 0.0], n_results=3)[-1]
+    assert last["id"] == "b" and last["content"] == "doc b2"
+    assert abs(last["similarity"] + 1.0) < 1e-6
+
+
+def test_numpy_index_ivf_matches_exact_search(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(8, 16))
+    vectors = np.repeat(centers, 50, axis=0) + rng.normal(scale=0.05, size=(400, 16))
+    ids = [str(i) for i in range(len(vectors))]
+
+    exact = _index(tmp_path / "exact", ivf_lists=0)
+    ivf = _index(tmp_path / "ivf", ivf_lists=8, nprobe=2, ivf_min_rows=100)
+    for index in (exact, ivf):
+        index.upsert(ids, vectors, ids, [{}] * len(ids))
+
+    query = centers[3]
+    expected = [r["id"] for r in exact.query(query, 5)]
+    assert [r["id"] for r in ivf.query(query, 5)] == expected
+    assert ivf.stats()["ivf_lists"] == 8
+
+
+def test_numpy_index_filters_on_metadata(tmp_path):
+    index = _index(tmp_path, ivf_lists=0)
+    index.upsert(
+        ids=["py", "js", "gen"],
+        embeddings=[[1.0, 0.0], [1.0, 0.1], [0.5, 0.5]],
+        documents=["py", "js", "gen"],
+        metadatas=[
+            {"language": "python", "topic": "a"},
+            {"language": "javascript", "topic": "a"},
+            {"language": "general", "topic": "b"}
+        ]
+    )
+
+    where = {"language": {"$in": ["python", "general"]}}
+    assert [r["id"] for r in index.query([1.0, 0.1], 5, where=where)] == ["py", "gen"]
+    assert [r["id"] for r in index.query([1.0, 0.1], 5, where={"$and": [where, {"topic": "a"}]})] == ["py"]
+
+    # تغيير البيانات الوصفية لجزء موجود يحدّث الفهرس المقلوب
+    index.upsert(ids=["js"], embeddings=[[1.0, 0.1]], documents=["js"], metadatas=[{"language": "python"}])
+    assert [r["id"] for r in index.query([1.0, 0.1], 5, where={"language": "python"})] == ["js", "py"]
+    assert index.query([1.0, 0.1], 5, where={"language": "javascript"}) == []
+
+
+def test_numpy_index_quantized_search_rescores_at_full_precision(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(300, 32)).astype(np.float32)
+    ids = [str(i) for i in range(len(vectors))]
+    _index(tmp_path, ivf_lists=0).upsert(ids, vectors, ids, [{"topic": "t"}] * len(ids))
+
+    exact = _index(tmp_path, ivf_lists=0).query(vectors[7], 5)
+    for mode in ("float16", "int8"):
+        index = _index(tmp_path, ivf_lists=0, quantization=mode)
+        results = index.query(vectors[7], 5)
+        assert [r["id"] for r in results] == [r["id"] for r in exact]
+        # الدرجات النهائية محسوبة من المتجهات الكاملة لا من النسخة المضغوطة
+        assert [r["similarity"] for r in results] == [r["similarity"] for r in exact]
+
+    # الإضافات بعد بناء النسخة المضغوطة تدخل في البحث
+    index.upsert(["new"], [vectors[7]], ["new"], [{"topic": "t"}])
+    assert index.query(vectors[7], 1)[0]["id"] in ("7", "new")
+    assert index.stats()["quantization"] == "int8"
@@ -2,3 +2,86 @@
 
 def test_web_research_init():
     assert True
+
+
+def test_extract_many_yields_as_completed_with_timeouts():
+    import asyncio
+
+    from app.web_research import WebResearcher
+
+    delays = {"http://a/slow": 0.2, "http://b/fast": 0.01, "http://c/hang": 5}
+
+    async def fake_extract(url):
+        await asyncio.sleep(delays[url])
+        return f"content of {url}"
+
+    async def run():
+        researcher = WebResearcher()
+        researcher.session = object()
+        researcher.extract_content = fake_extract
+        return [item async for item in researcher.extract_many(list(delays), per_url_timeout=0.5)]
+
+    results = asyncio.run(run())
+
+    assert [url for url, _ in results] == ["http://b/fast", "http://a/slow", "http://c/hang"]
+    assert results[-1][1] == ""
+
+
+def test_read_body_truncates_at_profile_limit(tmp_path, monkeypatch):
+    import asyncio
+
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    from app.web_research import ConnectionProfile, WebResearcher
+
+    monkeypatch.setenv("KNOWLEDGE_PATH", str(tmp_path))
+
+    async def handler(request):
+        return web.Response(body=b"x" * 200_000, content_type="text/html")
+
+    async def run():
+        application = web.Application()
+        application.router.add_get("/big", handler)
+        async with TestServer(application) as server:
+            researcher = WebResearcher(ConnectionProfile(limit_per_host=3, max_body_bytes=1000))
+            await researcher.initialize()
+            try:
+                # الجلسة مبنية من إعدادات الملف الشخصي
+                assert researcher.session.connector.limit_per_host == 3
+                async with researcher.session.get(server.make_url("/big")) as response:
+                    return await researcher._read_body(response)
+            finally:
+                await researcher.close()
+
+    assert asyncio.run(run()) == "x" * 1000
+
+
+def test_extract_many_awaits_cancelled_fetches():
+    import asyncio
+
+    from app.web_research import WebResearcher
+
+    finished = []
+
+    async def fake_extract(url):
+        try:
+            await asyncio.sleep(0 if url.endswith("fast") else 5)
+            return url
+        finally:
+            finished.append(url)
+
+    async def run():
+        researcher = WebResearcher()
+        researcher.session = object()
+        researcher.extract_content = fake_extract
+        results = researcher.extract_many(["http://a/fast", "http://b/slow", "http://c/slow"])
+        first = await results.__anext__()
+        await results.aclose()
+        # بعد الإغلاق لا تبقى مهام جلب معلقة
+        return first, list(finished)
+
+    first, finished_on_close = asyncio.run(run())
+
+    assert first == ("http://a/fast", "http://a/fast")
+    assert sorted(finished_on_close) == ["http://a/fast", "http://b/slow", "http://c/slow"]